@@ -1,11 +1,24 @@
+import base64
+import json
 import os
 import shutil
-from fastapi import FastAPI, HTTPException, Query
-from typing import List, Optional
+import time
+from decimal import Decimal
+import aiomysql
+import orjson
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.encoders import decimal_encoder
+from typing import Optional
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pymysql.err import MySQLError
 from credentials import TARGET_PATH
-from setup import log, MySQLConnection
+from setup import log, mysql_pool
+from async_db import AsyncMySQLConnection, async_pool_stats, close_async_pool, open_async_pool
+from auction_export import EXPORT_MEDIA_TYPES, ExportResponse, open_export_cursor, stream_csv, stream_ndjson, stream_parquet
+from auction_search import build_search, check_search_index
+from metrics import RUN_REPORT_PATH, metrics
+from response_cache import get_data_version, response_cache
 from datetime import datetime, timedelta
 
 app = FastAPI(docs_url=None, redoc_url=None, openapi_url=None)
@@ -16,10 +29,184 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
-@app.get('/auctions', response_model=List[dict])
-def get_auctions(
+api_request_seconds = metrics.timer('api_request_seconds', 'API request handling time, by route and status')
+pool_gauge = metrics.gauge('mysql_pool_connections', 'MySQL connection pool counters, by pool and stat')
+response_cache_gauge = metrics.gauge('response_cache', 'Response cache counters, by stat')
+# The scrape pipeline runs in another process, so its metrics come from the last run report
+last_run_finished_gauge = metrics.gauge('pipeline_last_run_finished_timestamp_seconds', 'When the last scrape run finished')
+last_run_duration_gauge = metrics.gauge('pipeline_last_run_duration_seconds', 'Duration of the last scrape run')
+last_run_stage_gauge = metrics.gauge('pipeline_last_run_stage_seconds', 'Last scrape run stage timings, by county')
+last_run_delta_gauge = metrics.gauge('pipeline_last_run_delta_rows', 'Last scrape run new/changed/removed/unchanged rows, by county')
+export_rows = metrics.counter('auction_export_rows_total', 'Rows streamed by /auctions/export, by format')
+
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    started = time.monotonic()
+    response = await call_next(request)
+    route = request.scope.get('route')
+    api_request_seconds.observe(
+        time.monotonic() - started, route=route.path if route else 'unmatched', status=response.status_code
+    )
+    return response
+
+
+def build_auction_filter(search):
+    """WHERE clause and params shared by the listing and count endpoints."""
+    where = "crawl_date >= %s"
+    params = [datetime.now() - timedelta(hours=20)]
+
+    if search and search.strip():
+        search_where, search_params = build_search(search)
+        where += f" AND {search_where}"
+        params.extend(search_params)
+    return where, params
+
+
+AUCTION_COLUMNS = (
+    'auction_id', 'bid', 'bid_open_date', 'bid_closing_date', 'debt', 'address',
+    'crawl_date', 'city', 'state', 'county', 'remark', 'v_o', 'zestimate', 'created_at'
+)
+# Columns the listing endpoints accept as sortField
+SORT_COLUMNS = set(AUCTION_COLUMNS)
+# /auctions select list: MySQL formats bid_open_date as DD/MM/YYYY (NULL stays NULL), so
+# rows come back from the DictCursor ready to serialize. %% because the query has params.
+AUCTION_SELECT = ', '.join(
+    "DATE_FORMAT(bid_open_date, '%%d/%%m/%%Y') AS bid_open_date" if column == 'bid_open_date' else column
+    for column in AUCTION_COLUMNS
+)
+
+
+def validate_sort(sortField, sortOrder):
+    sortOrder = sortOrder.upper()
+    if sortField not in SORT_COLUMNS or sortOrder not in ('ASC', 'DESC'):
+        raise HTTPException(status_code=400, detail="Invalid sortField or sortOrder")
+    return sortField, sortOrder
+
+
+def format_rows(description, results):
+    # Column names from the table
+    column_names = [desc[0] for desc in description]
+
+    # Convert tuples to dictionaries
+    result_dicts = [dict(zip(column_names, row)) for row in results]
+
+    # Format dates to 'DD/MM/YYYY'
+    for result in result_dicts:
+        # Counties scraped with the listing strategy have no open date
+        if result.get('bid_open_date') is not None:
+            result['bid_open_date'] = result['bid_open_date'].strftime('%d/%m/%Y')
+    return result_dicts
+
+
+def encode_cursor(sort_value, auction_id):
+    # Decimals and datetimes are sent back to MySQL as strings, which it compares correctly
+    if sort_value is not None and not isinstance(sort_value, (int, float, str)):
+        sort_value = str(sort_value)
+    raw = json.dumps([sort_value, auction_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        sort_value, auction_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return sort_value, auction_id
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def build_keyset_filter(sortField, sortOrder, cursor):
+    """
+    Condition selecting the rows after `cursor` in (sortField, auction_id) order.
+    MySQL sorts NULLs first ascending and last descending, which is spelled out here
+    because row comparisons against NULL never match.
+    """
+    sort_value, auction_id = decode_cursor(cursor)
+    op = '>' if sortOrder == 'ASC' else '<'
+    if sortField == 'auction_id':
+        return f"auction_id {op} %s", [auction_id]
+    if sort_value is None:
+        if sortOrder == 'ASC':
+            return f"(({sortField} IS NULL AND auction_id > %s) OR {sortField} IS NOT NULL)", [auction_id]
+        return f"({sortField} IS NULL AND auction_id < %s)", [auction_id]
+    condition = f"({sortField} {op} %s OR ({sortField} = %s AND auction_id {op} %s)"
+    if sortOrder == 'DESC':
+        condition += f" OR {sortField} IS NULL"
+    return condition + ")", [sort_value, sort_value, auction_id]
+
+
+# Totals for /auctions/page are reused for this many seconds per distinct filter.
+COUNT_CACHE_TTL = 30
+COUNT_CACHE_MAX_ENTRIES = 256
+count_cache = {}
+
+
+async def cached_count(search, where, params, version):
+    key = (version, search or '')
+    now = time.monotonic()
+    cached = count_cache.get(key)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    async with AsyncMySQLConnection() as cursor:
+        await cursor.execute(f"SELECT COUNT(*) FROM auction_data WHERE {where}", params)
+        result = await cursor.fetchone()
+    total_count = result[0] if result else 0
+
+    if len(count_cache) >= COUNT_CACHE_MAX_ENTRIES:
+        count_cache.pop(next(iter(count_cache)))
+    count_cache[key] = (now + COUNT_CACHE_TTL, total_count)
+    return total_count
+
+
+@app.on_event("startup")
+async def startup():
+    await open_async_pool()
+    try:
+        await check_search_index()
+    except MySQLError as e:
+        log.error(f"Could not check the search index: {e}")
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await close_async_pool()
+
+
+def json_default(value):
+    # orjson handles datetimes itself; Decimals are encoded like FastAPI's jsonable_encoder does
+    if isinstance(value, Decimal):
+        return decimal_encoder(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def encode_json(content):
+    return orjson.dumps(content, default=json_default)
+
+
+async def cached_response(request, key, build):
+    """
+    Serves `build()` through the response cache. Responses carry an ETag so clients
+    that send it back in If-None-Match get a 304 while the data is unchanged.
+    """
+    version = await get_data_version()
+    entry = response_cache.get(version, key)
+    if entry is None:
+        entry = response_cache.put(version, key, encode_json(await build(version)))
+    etag, body = entry
+
+    if request.headers.get('if-none-match') == etag:
+        response_cache.record_not_modified()
+        return Response(status_code=304, headers={'ETag': etag})
+    return Response(content=body, media_type='application/json', headers={'ETag': etag})
+
+
+@app.get('/auctions')
+async def get_auctions(
+    request: Request,
     page: int = Query(1, ge=1),
     pageSize: int = Query(10, ge=1),
     sortField: str = Query('auction_id'),
@@ -27,80 +214,143 @@ def get_auctions(
     search: Optional[str] = Query(None)
 ):
     offset = (page - 1) * pageSize
-    
-    # Base query to fetch data
-    query = f"""
-        SELECT * FROM auction_data 
-        WHERE crawl_date >= %s
-    """
-    
-    # Parameters for SQL query
-    params = [datetime.now() - timedelta(hours=20)]
-    
-    # If there's a search term, add search conditions
-    if search:
-        # Columns to search through
-        search_columns = [
-            'auction_id', 'bid', 'bid_open_date', 'bid_closing_date',
-            'debt', 'address', 'crawl_date', 'city', 'state', 'county', 'remark', 'v_o', 'zestimate'
-        ]
-        
-        # Build the WHERE clause for search (case insensitive)
-        where_clauses = []
-        for column in search_columns:
-            where_clauses.append(f"LOWER({column}) LIKE %s")
-            params.append(f"%{search.lower()}%")
-        
-        query += " AND (" + " OR ".join(where_clauses) + ")"
+    sortField, sortOrder = validate_sort(sortField, sortOrder)
+    where, params = build_auction_filter(search)
 
-    # Add ORDER BY and LIMIT clauses
-    query += f" ORDER BY {sortField} {sortOrder} LIMIT %s, %s"
+    # Qualified, because in ORDER BY a bare bid_open_date would mean the formatted alias
+    query = f"SELECT {AUCTION_SELECT} FROM auction_data WHERE {where} ORDER BY auction_data.{sortField} {sortOrder} LIMIT %s, %s"
     params.extend([offset, pageSize])
 
+    async def build(version):
+        try:
+            async with AsyncMySQLConnection(aiomysql.DictCursor) as cursor:
+                await cursor.execute(query, params)
+                return await cursor.fetchall()
+        except MySQLError as e:
+            log.error(f"Error while querying MySQL: {e}")
+            raise HTTPException(status_code=500, detail="Error while querying the database")
+
+    key = ('auctions', page, pageSize, sortField, sortOrder, search)
+    return await cached_response(request, key, build)
+
+
+@app.get('/auctions/page')
+async def get_auctions_page(
+    request: Request,
+    page: int = Query(1, ge=1),
+    pageSize: int = Query(10, ge=1),
+    sortField: str = Query('auction_id'),
+    sortOrder: str = Query('ASC'),
+    search: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None)
+):
+    """
+    One page of auctions plus the total for the filter. Pass the returned `next_cursor`
+    as `cursor` to page forward by keyset instead of OFFSET; `page` is then ignored.
+    """
+    sortField, sortOrder = validate_sort(sortField, sortOrder)
+    where, params = build_auction_filter(search)
+
+    query_where, query_params = where, list(params)
+    if cursor:
+        keyset_where, keyset_params = build_keyset_filter(sortField, sortOrder, cursor)
+        query_where += f" AND {keyset_where}"
+        query_params.extend(keyset_params)
+        limit, limit_params = "LIMIT %s", [pageSize]
+    else:
+        limit, limit_params = "LIMIT %s, %s", [(page - 1) * pageSize, pageSize]
+
+    order_by = f"{sortField} {sortOrder}" if sortField == 'auction_id' else f"{sortField} {sortOrder}, auction_id {sortOrder}"
+    query = f"SELECT * FROM auction_data WHERE {query_where} ORDER BY {order_by} {limit}"
+
+    async def build(version):
+        try:
+            total_count = await cached_count(search, where, params, version)
+            async with AsyncMySQLConnection() as db_cursor:
+                await db_cursor.execute(query, query_params + limit_params)
+                results = await db_cursor.fetchall()
+                description = db_cursor.description
+        except MySQLError as e:
+            log.error(f"Error while querying MySQL: {e}")
+            raise HTTPException(status_code=500, detail="Error while querying the database")
+
+        next_cursor = None
+        if len(results) == pageSize:
+            column_names = [desc[0] for desc in description]
+            last = dict(zip(column_names, results[-1]))
+            next_cursor = encode_cursor(last[sortField], last['auction_id'])
+
+        return {
+            "rows": format_rows(description, results),
+            "total_count": total_count,
+            "next_cursor": next_cursor,
+        }
+
+    key = ('auctions/page', page if not cursor else None, pageSize, sortField, sortOrder, search, cursor)
+    return await cached_response(request, key, build)
+
+def import_pyarrow():
+    # Only needed for Parquet exports, so it's optional (pip install pyarrow)
     try:
-        with MySQLConnection() as cursor:
-            cursor.execute(query, params)
-            results = cursor.fetchall()
-            
-            # Column names from the table
-            column_names = [desc[0] for desc in cursor.description]
-            
-            # Convert tuples to dictionaries
-            result_dicts = [dict(zip(column_names, row)) for row in results]
-            
-            # Format dates to 'DD/MM/YYYY'
-            for result in result_dicts:
-                if 'bid_open_date' in result:
-                    result['bid_open_date'] = result['bid_open_date'].strftime('%d/%m/%Y')
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise HTTPException(status_code=400, detail="Parquet export is not available: pyarrow is not installed")
+    return pyarrow, pyarrow.parquet
+
 
-        return result_dicts
+@app.get('/auctions/export')
+async def export_auctions(
+    export_format: str = Query('csv', alias='format'),
+    sortField: str = Query('auction_id'),
+    sortOrder: str = Query('ASC'),
+    search: Optional[str] = Query(None)
+):
+    """
+    Every auction matching the /auctions filters, streamed as CSV, NDJSON or Parquet
+    straight from a server-side cursor instead of being paged through /auctions.
+    Dates are sent as stored (ISO), not formatted like the dashboard's bid_open_date.
+    """
+    if export_format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"format must be one of {', '.join(EXPORT_MEDIA_TYPES)}")
+    arrow = import_pyarrow() if export_format == 'parquet' else None
+    sortField, sortOrder = validate_sort(sortField, sortOrder)
+    where, params = build_auction_filter(search)
+    query = f"SELECT {', '.join(AUCTION_COLUMNS)} FROM auction_data WHERE {where} ORDER BY {sortField} {sortOrder}"
+
+    try:
+        connection, chunks = await open_export_cursor(query, params)
     except MySQLError as e:
-        log.error("Error while querying MySQL", e)
+        log.error(f"Error while exporting auctions: {e}")
         raise HTTPException(status_code=500, detail="Error while querying the database")
 
-@app.get('/auctions/count')
-def count_auctions(search: Optional[str] = Query(None)):
-    # Base query to count data
-    query = "SELECT COUNT(*) AS total_count FROM auction_data WHERE crawl_date >= %s"
+    async def counted(chunks):
+        async for rows in chunks:
+            export_rows.inc(len(rows), format=export_format)
+            yield rows
 
-    params = [datetime.now() - timedelta(hours=20)]
+    if export_format == 'csv':
+        body = stream_csv(AUCTION_COLUMNS, counted(chunks))
+    elif export_format == 'ndjson':
+        body = stream_ndjson(AUCTION_COLUMNS, counted(chunks), json_default)
+    else:
+        body = stream_parquet(AUCTION_COLUMNS, counted(chunks), *arrow)
+    filename = f"auctions_{datetime.now():%Y%m%d_%H%M%S}.{export_format}"
+    return ExportResponse(
+        body, connection, media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'},
+    )
 
-    if search:
-        search_columns = [
-            'auction_id', 'bid', 'bid_open_date', 'bid_closing_date',
-            'debt', 'address', 'crawl_date', 'city', 'state', 'county', 'remark', 'v_o', 'zestimate'
-        ]
-        where_clauses = []
-        for column in search_columns:
-            where_clauses.append(f"LOWER({column}) LIKE %s")
-            params.append(f"%{search.lower()}%")
-        
-        query += " AND (" + " OR ".join(where_clauses) + ")"
+
+@app.get('/auctions/count')
+async def count_auctions(search: Optional[str] = Query(None)):
+    where, params = build_auction_filter(search)
+    query = f"SELECT COUNT(*) AS total_count FROM auction_data WHERE {where}"
 
     try:
-        with MySQLConnection() as cursor:
-            cursor.execute(query, params)
-            result = cursor.fetchone()
+        async with AsyncMySQLConnection() as cursor:
+            await cursor.execute(query, params)
+            result = await cursor.fetchone()
             
             if result:
                 total_count = result[0]  # Access the count by index
@@ -108,11 +358,50 @@ def count_auctions(search: Optional[str] = Query(None)):
                 total_count = 0
         
         return {"total_count": total_count}
-    except:
-        log.error("Error while counting auctions")
+    except MySQLError as e:
+        log.error(f"Error while counting auctions: {e}")
         raise HTTPException(status_code=500, detail="Error while counting auctions")
 
 
+@app.get('/cache/stats')
+def cache_stats():
+    return response_cache.stats()
+
+
+@app.get('/pool/stats')
+def pool_stats():
+    return {'sync': mysql_pool.stats(), 'async': async_pool_stats()}
+
+
+def export_run_report():
+    try:
+        with open(RUN_REPORT_PATH) as file:
+            report = json.load(file)
+    except (OSError, ValueError):
+        return
+    if report.get('finished_at'):
+        last_run_finished_gauge.set(datetime.fromisoformat(report['finished_at']).timestamp())
+    last_run_duration_gauge.set(report.get('duration', 0))
+    for source, stages in report.get('timings', {}).items():
+        for stage, seconds in stages.items():
+            last_run_stage_gauge.set(seconds, source=source, stage=stage)
+    for source, changes in report.get('deltas', {}).items():
+        for change, count in changes.items():
+            last_run_delta_gauge.set(count, source=source, change=change)
+
+
+@app.get('/metrics', response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Prometheus text exposition of the API's own metrics and the last pipeline run."""
+    for pool, stats in (('sync', mysql_pool.stats()), ('async', async_pool_stats())):
+        for stat, value in stats.items():
+            if isinstance(value, (int, float)):
+                pool_gauge.set(value, pool=pool, stat=stat)
+    for stat, value in response_cache.stats().items():
+        response_cache_gauge.set(value, stat=stat)
+    export_run_report()
+    return PlainTextResponse(metrics.render(), media_type='text/plain; version=0.0.4')
+
     
 @app.delete('/maya')
 def destroy(psst: str = Query(...)):
@@ -0,0 +1,95 @@
+import aiomysql
+import anyio
+
+from setup import mysql_config
+
+# Connection pool used by the async API handlers. The scrapers keep using the
+# synchronous setup.MySQLConnection pool. Connections are opened on demand (min 0),
+# so the API still starts while MySQL is unreachable and serves 500s until it's back.
+ASYNC_POOL_MIN_SIZE = 0
+ASYNC_POOL_MAX_SIZE = 20
+# Connections older than this many seconds are recycled on checkout.
+ASYNC_POOL_RECYCLE = 300
+
+async_pool = None
+
+
+async def open_async_pool():
+    global async_pool
+    config = mysql_config()
+    async_pool = await aiomysql.create_pool(
+        host=config['host'],
+        user=config['user'],
+        password=config['password'],
+        db=config['database'],
+        port=config['port'],
+        minsize=ASYNC_POOL_MIN_SIZE,
+        maxsize=ASYNC_POOL_MAX_SIZE,
+        pool_recycle=ASYNC_POOL_RECYCLE,
+    )
+
+
+async def close_async_pool():
+    global async_pool
+    if async_pool is not None:
+        async_pool.close()
+        await async_pool.wait_closed()
+        async_pool = None
+
+
+def async_pool_stats():
+    if async_pool is None:
+        return {}
+    return {
+        'size': async_pool.size,
+        'free': async_pool.freesize,
+        'min_size': async_pool.minsize,
+        'max_size': async_pool.maxsize,
+    }
+
+
+class AsyncMySQLConnection:
+    """Async counterpart of setup.MySQLConnection, backed by the aiomysql pool."""
+
+    def __init__(self, cursor_class=aiomysql.Cursor):
+        self.cursor_class = cursor_class
+        self.released = False
+
+    async def __aenter__(self):
+        self.connection = await async_pool.acquire()
+        try:
+            self.cursor = await self.connection.cursor(self.cursor_class)
+        except BaseException:
+            self.release(discard=True)
+            raise
+        return self.cursor
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        if exc_tb is not None:
+            # Closing the connection rolls the transaction back on the server, without
+            # awaiting anything that a cancellation could interrupt
+            self.release(discard=True)
+            return
+        finished = False
+        try:
+            # Shielded so that a request cancelled while committing (e.g. the client
+            # went away) still ends its transaction cleanly
+            with anyio.CancelScope(shield=True):
+                await self.connection.commit()
+                await self.cursor.close()
+            finished = True
+        finally:
+            self.release(discard=not finished)
+
+    def release(self, discard=False):
+        """
+        Gives the connection back to the pool, closing it first if discard is set (the
+        pool drops closed connections). Not a coroutine, so it can't be cancelled, and
+        safe to call more than once.
+        """
+        if self.released:
+            return
+        self.released = True
+        if discard:
+            self.connection.close()
+        async_pool.release(self.connection)
@@ -0,0 +1,152 @@
+import csv
+import io
+
+import aiomysql
+import orjson
+from fastapi.responses import StreamingResponse
+
+from async_db import AsyncMySQLConnection
+
+# Rows read from the server-side cursor per round trip; also the CSV/NDJSON chunk and
+# Parquet row group size, so memory stays flat however many rows are exported.
+EXPORT_CHUNK_ROWS = 5000
+EXPORT_MEDIA_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+# Parquet column types by auction_data column; anything not listed is a string
+PARQUET_TYPES = {
+    'auction_id': 'int64',
+    'bid': 'float64',
+    'debt': 'float64',
+    'v_o': 'float64',
+    'zestimate': 'float64',
+    'bid_open_date': 'timestamp',
+    'bid_closing_date': 'timestamp',
+    'crawl_date': 'timestamp',
+    'created_at': 'timestamp',
+}
+
+
+async def open_export_cursor(query, params):
+    """
+    Runs `query` on an unbuffered (server-side) cursor, so errors surface before the
+    response starts. Returns the AsyncMySQLConnection and an async generator of
+    row-tuple chunks. The connection goes back to the pool once every row has been
+    read; otherwise ExportResponse closes it.
+    """
+    connection = AsyncMySQLConnection(aiomysql.SSCursor)
+    cursor = await connection.__aenter__()
+    try:
+        await cursor.execute(query, params)
+    except BaseException:
+        connection.release(discard=True)
+        raise
+
+    async def chunks():
+        while True:
+            rows = await cursor.fetchmany(EXPORT_CHUNK_ROWS)
+            if not rows:
+                break
+            yield rows
+        await connection.__aexit__(None, None, None)
+
+    return connection, chunks()
+
+
+class ExportResponse(StreamingResponse):
+    """
+    StreamingResponse that always lets go of its export connection: when the client
+    disconnects, the stream fails, or it never starts. Committing or closing the
+    cursor would first read the rest of the server-side result, so an unfinished
+    export's connection is closed instead (a no-op after a complete one).
+    """
+
+    def __init__(self, content, connection, **kwargs):
+        super().__init__(content, **kwargs)
+        self.connection = connection
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.connection.release(discard=True)
+
+
+async def stream_csv(columns, chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue().encode()
+    async for rows in chunks:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+
+
+async def stream_ndjson(columns, chunks, default):
+    async for rows in chunks:
+        yield b''.join(
+            orjson.dumps(dict(zip(columns, row)), default=default, option=orjson.OPT_APPEND_NEWLINE) for row in rows
+        )
+
+
+class ParquetSink:
+    """Write-only file for pyarrow that hands back what was written since the last drain()."""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+        self.closed = False
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        # Offsets in the Parquet footer are positions in the whole stream
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data, self.parts = b''.join(self.parts), []
+        return data
+
+
+def parquet_schema(pa, columns):
+    types = {'int64': pa.int64(), 'float64': pa.float64(), 'timestamp': pa.timestamp('us')}
+    return pa.schema([(column, types.get(PARQUET_TYPES.get(column), pa.string())) for column in columns])
+
+
+def arrow_column(pa, values, field):
+    if field.type == pa.float64():
+        # MySQL DECIMALs arrive as Decimal, which pyarrow won't cast to double
+        values = [None if value is None else float(value) for value in values]
+    elif field.type == pa.string():
+        values = [None if value is None else str(value) for value in values]
+    return pa.array(values, type=field.type)
+
+
+async def stream_parquet(columns, chunks, pa, pq):
+    """One row group per chunk, sent as soon as it's written; the footer comes last."""
+    schema = parquet_schema(pa, columns)
+    sink = ParquetSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        async for rows in chunks:
+            values = list(zip(*rows))
+            writer.write_table(pa.Table.from_arrays(
+                [arrow_column(pa, column, field) for column, field in zip(values, schema)], schema=schema
+            ))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,84 @@
+import heapq
+import os
+import struct
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta
+
+from setup import MySQLConnection, log
+
+AUCTION_ID_INDEX_PATH = 'auction_ids.idx'
+# File layout: header (sync high-water mark as seconds since EPOCH, ID count)
+# followed by the sorted IDs as little-endian int64.
+HEADER = struct.Struct('<dq')
+# created_at is a naive local DATETIME, so the mark is stored as naive arithmetic from
+# this epoch rather than via timestamp()/fromtimestamp(), which are ambiguous around DST
+EPOCH = datetime(1970, 1, 1)
+# Each refresh re-reads rows created this long before the mark: saves stamp created_at
+# when they start, so rows committed later by a slow or parallel county save can land
+# below it, and the DST fall-back repeats an hour. Re-read IDs are deduplicated.
+REFRESH_OVERLAP = timedelta(days=1)
+
+
+class AuctionIdIndex:
+    """
+    Sorted array of the auction IDs already in auction_data, kept on disk and topped up
+    from MySQL with only the rows created since the last refresh (plus REFRESH_OVERLAP).
+    """
+
+    def __init__(self, path=AUCTION_ID_INDEX_PATH):
+        self.path = path
+        self.ids = array('q')
+        self.synced_until = None
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'rb') as file:
+                synced_until, count = HEADER.unpack(file.read(HEADER.size))
+                ids = array('q')
+                ids.fromfile(file, count)
+        except (OSError, EOFError, struct.error) as e:
+            log.warning(f"Ignoring unreadable auction ID index {self.path}: {e}")
+            return
+        self.ids = ids
+        self.synced_until = EPOCH + timedelta(seconds=synced_until)
+
+    def save(self):
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(HEADER.pack((self.synced_until - EPOCH).total_seconds(), len(self.ids)))
+            self.ids.tofile(file)
+        os.replace(temp_path, self.path)
+
+    def refresh(self):
+        query = "SELECT auction_id, created_at FROM auction_data"
+        params = ()
+        if self.synced_until is not None:
+            query += " WHERE created_at >= %s"
+            params = (self.synced_until - REFRESH_OVERLAP,)
+        with MySQLConnection() as cursor:
+            cursor.execute(query, params)
+            rows = cursor.fetchall()
+
+        new_ids = sorted({int(auction_id) for auction_id, _ in rows if int(auction_id) not in self})
+        if new_ids:
+            self.ids = array('q', heapq.merge(self.ids, new_ids))
+        created = [created_at for _, created_at in rows if created_at is not None]
+        if created:
+            latest = max(created)
+            self.synced_until = max(latest, self.synced_until) if self.synced_until else latest
+        elif self.synced_until is None:
+            self.synced_until = datetime.now()
+        log.info(f"Auction ID index: {len(new_ids)} new, {len(self.ids)} total")
+        self.save()
+        return self
+
+    def __contains__(self, auction_id):
+        position = bisect_left(self.ids, auction_id)
+        return position < len(self.ids) and self.ids[position] == auction_id
+
+    def __len__(self):
+        return len(self.ids)
@@ -0,0 +1,155 @@
+import re
+from datetime import datetime, timedelta
+
+from async_db import AsyncMySQLConnection
+from setup import MySQLConnection, log
+
+FULLTEXT_INDEX_NAME = 'ft_auction_search'
+FULLTEXT_COLUMNS = ('address', 'city', 'county', 'remark')
+FULLTEXT_INDEX_DDL = f"ALTER TABLE {{table}} ADD FULLTEXT INDEX {FULLTEXT_INDEX_NAME} ({', '.join(FULLTEXT_COLUMNS)})"
+
+# InnoDB ignores words shorter than innodb_ft_min_token_size (3 by default) and the
+# words in its default stopword list, so those are matched with LIKE instead.
+FULLTEXT_MIN_TOKEN_SIZE = 3
+FULLTEXT_STOPWORDS = {
+    'a', 'about', 'an', 'are', 'as', 'at', 'be', 'by', 'com', 'de', 'en', 'for', 'from', 'how', 'i',
+    'in', 'is', 'it', 'la', 'of', 'on', 'or', 'that', 'the', 'this', 'to', 'was', 'what', 'when',
+    'where', 'who', 'will', 'with', 'und', 'www',
+}
+
+NUMERIC_COLUMNS = ('auction_id', 'bid', 'debt', 'zestimate')
+DATE_COLUMNS = ('bid_open_date', 'bid_closing_date')
+DATE_FORMATS = ('%d/%m/%Y', '%m/%d/%Y', '%Y-%m-%d')
+
+# The original search: substring match over every column. Kept for the benchmark.
+LIKE_COLUMNS = [
+    'auction_id', 'bid', 'bid_open_date', 'bid_closing_date',
+    'debt', 'address', 'crawl_date', 'city', 'state', 'county', 'remark', 'v_o', 'zestimate'
+]
+
+
+def build_like_search(search):
+    where_clauses = []
+    params = []
+    for column in LIKE_COLUMNS:
+        where_clauses.append(f"LOWER({column}) LIKE %s")
+        params.append(f"%{search.lower()}%")
+    return "(" + " OR ".join(where_clauses) + ")", params
+
+
+def parse_number(search):
+    cleaned = search.strip().lstrip('$').replace(',', '')
+    try:
+        return float(cleaned) if '.' in cleaned else int(cleaned)
+    except ValueError:
+        return None
+
+
+def parse_date(search):
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(search.strip(), date_format)
+        except ValueError:
+            continue
+    return None
+
+
+def build_search(search, table='auction_data'):
+    """
+    WHERE fragment for a dashboard search. Words go through the FULLTEXT index on
+    address/city/county/remark as prefix matches; a search that is a number, a date or
+    a state code is also matched exactly against the typed columns.
+
+    MySQL can't use the FULLTEXT index (or the primary key) for a condition ORed with
+    others, so when one of several ways to match can use an index, each way is its own
+    SELECT and the auction IDs they find are UNIONed.
+    """
+    branches = []
+
+    words = re.findall(r'[a-z0-9]+', search.lower())
+    indexed = [w for w in words if len(w) >= FULLTEXT_MIN_TOKEN_SIZE and w not in FULLTEXT_STOPWORDS]
+    # Short words and stopwords can't be found through the index; they're checked with
+    # LIKE on the whole term, which only has to scan what MATCH found if any word is indexed
+    term = f"%{search.strip().lower()}%"
+    like = "(" + " OR ".join(f"LOWER({column}) LIKE %s" for column in FULLTEXT_COLUMNS) + ")"
+    if indexed:
+        match = f"MATCH({', '.join(FULLTEXT_COLUMNS)}) AGAINST (%s IN BOOLEAN MODE)"
+        params = [' '.join(f'+{w}*' for w in indexed)]
+        if len(indexed) < len(words):
+            match += f" AND {like}"
+            params.extend([term] * len(FULLTEXT_COLUMNS))
+        branches.append((match, params, True))
+    elif words:
+        branches.append((like, [term] * len(FULLTEXT_COLUMNS), False))
+
+    # The other typed columns aren't indexed, so they share one scan
+    typed_clauses = []
+    typed_params = []
+    number = parse_number(search)
+    if number is not None:
+        branches.append(("auction_id = %s", [number], True))
+        typed_clauses.extend(f"{column} = %s" for column in NUMERIC_COLUMNS if column != 'auction_id')
+        typed_params.extend([number] * (len(NUMERIC_COLUMNS) - 1))
+
+    date = parse_date(search)
+    if date is not None:
+        for column in DATE_COLUMNS:
+            typed_clauses.append(f"({column} >= %s AND {column} < %s)")
+            typed_params.extend([date, date + timedelta(days=1)])
+
+    if re.fullmatch(r'[A-Za-z]{2}', search.strip()):
+        typed_clauses.append("state = %s")
+        typed_params.append(search.strip().upper())
+
+    if typed_clauses:
+        branches.append(("(" + " OR ".join(typed_clauses) + ")", typed_params, False))
+
+    if not branches:
+        return "FALSE", []
+    params = [param for _, branch_params, _ in branches for param in branch_params]
+    if len(branches) == 1 or not any(indexed for _, _, indexed in branches):
+        # Every branch scans anyway, so one scan with ORs is cheapest
+        return "(" + " OR ".join(condition for condition, _, _ in branches) + ")", params
+    # The derived table makes MySQL materialize the UNION once instead of re-running
+    # it for every outer row
+    union = " UNION ".join(f"SELECT auction_id FROM {table} WHERE {condition}" for condition, _, _ in branches)
+    return f"auction_id IN (SELECT auction_id FROM ({union}) AS matched)", params
+
+
+SEARCH_INDEX_QUERY = """
+    SELECT COUNT(*) FROM information_schema.statistics
+    WHERE table_schema = DATABASE() AND table_name = 'auction_data' AND index_name = %s
+"""
+
+
+async def check_search_index():
+    """
+    Warns if auction_data lacks the FULLTEXT index. It's in schema.sql; an existing
+    database gets it from `python auction_search.py`, which is too slow (and locks too
+    much) to run on every API start.
+    """
+    async with AsyncMySQLConnection() as cursor:
+        await cursor.execute(SEARCH_INDEX_QUERY, (FULLTEXT_INDEX_NAME,))
+        (exists,) = await cursor.fetchone()
+    if not exists:
+        log.warning(
+            f"auction_data has no FULLTEXT index {FULLTEXT_INDEX_NAME}; searches will fail until "
+            f"`python auction_search.py` has been run"
+        )
+    return bool(exists)
+
+
+def create_search_index():
+    """One-off migration: adds the FULLTEXT index to auction_data if it isn't there yet."""
+    with MySQLConnection() as cursor:
+        cursor.execute(SEARCH_INDEX_QUERY, (FULLTEXT_INDEX_NAME,))
+        (exists,) = cursor.fetchone()
+        if exists:
+            log.info(f"FULLTEXT index {FULLTEXT_INDEX_NAME} already exists")
+            return
+        log.info(f"Creating FULLTEXT index {FULLTEXT_INDEX_NAME} on auction_data")
+        cursor.execute(FULLTEXT_INDEX_DDL.format(table='auction_data'))
+
+
+if __name__ == "__main__":
+    create_search_index()
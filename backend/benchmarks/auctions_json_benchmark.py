@@ -0,0 +1,91 @@
+"""
+Compares the previous /auctions serialization (tuples zipped into dicts, bid_open_date
+formatted per row, jsonable_encoder + json.dumps) with the current one (rows as the
+DictCursor returns them, bid_open_date already formatted by MySQL, orjson) on
+synthetic rows. To keep the comparison conservative the current path's time includes
+building the dicts and formatting the dates in Python, which the DictCursor and MySQL
+do in production.
+
+Reports wall time per page size and checks that both produce the same JSON values.
+
+    python benchmarks/auctions_json_benchmark.py --sizes 25 500 20000
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+from api import AUCTION_COLUMNS, encode_json, format_rows  # noqa: E402
+
+DESCRIPTION = [(column,) for column in AUCTION_COLUMNS]
+
+
+def generate_rows(count):
+    """Tuples in AUCTION_COLUMNS order, typed the way pymysql returns them."""
+    now = datetime.now().replace(microsecond=0)
+    rows = []
+    for auction_id in range(1, count + 1):
+        opens = now + timedelta(hours=random.randint(0, 2000)) if random.random() > 0.1 else None
+        debt = Decimal(f"{random.uniform(5000, 400000):.2f}") if random.random() > 0.1 else None
+        zestimate = float(random.randint(50, 900) * 1000) if random.random() > 0.2 else None
+        rows.append((
+            auction_id, Decimal(f"{random.uniform(1000, 100000):.2f}"), opens, opens and opens + timedelta(days=7),
+            debt, f"{random.randint(1, 9999)} Main St West Chester PA 19380", now, 'Chester', 'PA', 'Chester', '',
+            zestimate / float(debt) if zestimate and debt else None, zestimate, now,
+        ))
+    return rows
+
+
+def encode_before(rows):
+    return json.dumps(jsonable_encoder(format_rows(DESCRIPTION, rows)), separators=(',', ':')).encode()
+
+
+def dict_cursor_rows(rows):
+    # What aiomysql.DictCursor hands back for the AUCTION_SELECT query
+    at = AUCTION_COLUMNS.index('bid_open_date')
+    return [
+        dict(zip(AUCTION_COLUMNS, row[:at] + (row[at] and row[at].strftime('%d/%m/%Y'),) + row[at + 1:]))
+        for row in rows
+    ]
+
+
+def encode_after(rows):
+    return encode_json(dict_cursor_rows(rows))
+
+
+def timed(func, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[25, 500, 20000])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    all_match = True
+    print(f"{'rows':>8}{'before ms':>12}{'after ms':>12}{'speedup':>10}  match")
+    for size in args.sizes:
+        rows = generate_rows(size)
+        before, before_time = timed(encode_before, rows)
+        after, after_time = timed(encode_after, rows)
+        match = json.loads(before) == json.loads(after)
+        all_match &= match
+        print(f"{size:>8}{before_time * 1000:>12.2f}{after_time * 1000:>12.2f}{before_time / after_time:>9.1f}x  {match}")
+    if not all_match:
+        sys.exit(1)
@@ -0,0 +1,70 @@
+"""
+HTTP load test for the auctions API.
+
+Runs a fixed number of concurrent clients against an endpoint for a while and
+reports requests per second and latency percentiles. Run it once against the
+previous (sync) build and once against the current one to compare:
+
+    python benchmarks/load_test.py --url http://localhost:3001/auctions?pageSize=25 --clients 200 --duration 30
+
+Requires httpx (pip install -r requirements-dev.txt).
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+async def client_loop(client, url, deadline, latencies, errors):
+    while time.monotonic() < deadline:
+        started = time.monotonic()
+        try:
+            response = await client.get(url)
+            if response.status_code >= 400:
+                errors.append(response.status_code)
+                continue
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            continue
+        latencies.append(time.monotonic() - started)
+
+
+async def run(url, clients, duration):
+    latencies, errors = [], []
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        started = time.monotonic()
+        deadline = started + duration
+        await asyncio.gather(*(client_loop(client, url, deadline, latencies, errors) for _ in range(clients)))
+        elapsed = time.monotonic() - started
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': len(errors),
+        'rps': len(latencies) / elapsed,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='http://localhost:3001/auctions?page=1&pageSize=25')
+    parser.add_argument('--clients', type=int, default=200)
+    parser.add_argument('--duration', type=float, default=30)
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args.url, args.clients, args.duration))
+    print(f"{args.clients} clients, {args.duration:.0f}s against {args.url}")
+    print(f"requests={result['requests']} errors={result['errors']} "
+          f"rps={result['rps']:.1f} p50={result['p50_ms']:.1f}ms p95={result['p95_ms']:.1f}ms p99={result['p99_ms']:.1f}ms")
@@ -0,0 +1,77 @@
+"""
+Compares the scalar monetary parser (setup.clean_monetary_string) with its
+column-wise version, parsing.clean_monetary_series, on synthetic strings (1M by default).
+
+Two columns are timed: one where every string is generated independently (mostly
+distinct), and one sampled from --pool distinct strings, the way bid amounts repeat
+in a county list. Reports wall time for each and checks that both produce the same
+values, NaN included.
+
+    python benchmarks/parsing_benchmark.py --rows 1000000 --pool 20000
+"""
+import argparse
+import logging
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parsing import clean_monetary_series  # noqa: E402
+from setup import clean_monetary_string, log  # noqa: E402
+
+def synthetic_amount():
+    kind = random.random()
+    if kind < 0.6:
+        return f"${random.uniform(0, 500000):,.2f}"
+    if kind < 0.75:
+        return f"${random.randint(0, 10 ** 7)}"
+    if kind < 0.85:
+        return f"Current bid: ${random.randint(1, 999):,}.{random.randint(0, 9)} USD"
+    return random.choice([None, '', 'N/A', '$', '$,', '$1.', '$,.', '12,000', '$1,2,3'])
+
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def compare(amounts):
+    """Returns (scalar seconds, column-wise seconds, values match, failed parses)."""
+    scalar_amounts, scalar_time = timed(lambda: [clean_monetary_string(value) for value in amounts])
+    (vector_amounts, failed), vector_time = timed(clean_monetary_series, amounts)
+    match = np.array_equal(
+        np.array([np.nan if value is None else value for value in scalar_amounts], dtype='float64'),
+        vector_amounts.to_numpy(), equal_nan=True
+    )
+    return scalar_time, vector_time, match, failed.sum()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--pool', type=int, default=20_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    # clean_monetary_string logs an error for every None
+    log.setLevel(logging.CRITICAL)
+    amount_pool = [synthetic_amount() for _ in range(args.pool)]
+    scenarios = {
+        'distinct': [synthetic_amount() for _ in range(args.rows)],
+        f'pool of {args.pool}': random.choices(amount_pool, k=args.rows),
+    }
+
+    all_match = True
+    print(f"{'column':<20}{'scalar s':>10}{'column s':>10}{'speedup':>10}  match  failed")
+    for scenario, amounts in scenarios.items():
+        scalar_time, vector_time, match, failed = compare(amounts)
+        all_match &= match
+        print(f"{scenario:<20}{scalar_time:>10.2f}{vector_time:>10.2f}"
+              f"{scalar_time / vector_time:>9.1f}x  {str(match):<6}{failed:>7}")
+    if not all_match:
+        sys.exit(1)
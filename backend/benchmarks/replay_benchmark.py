@@ -0,0 +1,194 @@
+"""
+Times the pipeline stages offline, against replay fixtures (see replay.py): property
+list parsing, saving to MySQL (first run and an unchanged re-run), auction detail
+pages, the zestimate crawler and the /auctions endpoint. bid4assets, ScrapeOps and
+Zillow are never contacted; the MySQL server from credentials.CONFIG (or MYSQL_HOST,
+MYSQL_USER, ...) only hosts a throwaway database that is dropped afterwards.
+
+Without --fixtures, synthetic fixtures are generated for every property list county.
+Each run is appended to --history and compared with the previous run there.
+
+    python benchmarks/replay_benchmark.py --rows 500 --latency 0.05
+    python benchmarks/replay_benchmark.py --fixtures replay_fixtures
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from api import app  # noqa: E402
+from bids_scraper import DETAIL_FETCH_WORKERS, fetch_other_values, iter_property_list  # noqa: E402
+from counties import enabled_counties  # noqa: E402
+from main import sync_bids_records  # noqa: E402
+from metrics import metrics  # noqa: E402
+from replay import FixtureStore, generate_fixtures, replay_environment  # noqa: E402
+from setup import log  # noqa: E402
+from zillow_scraper import ZILLOW_MAX_WORKERS, ZillowCrawler  # noqa: E402
+
+HISTORY_PATH = 'replay_benchmark_history.jsonl'
+AUCTIONS_QUERIES = {
+    'auctions_first_page': {'page': 1, 'pageSize': 25},
+    'auctions_sorted': {'page': 1, 'pageSize': 25, 'sortField': 'bid', 'sortOrder': 'DESC'},
+    'auctions_search': {'page': 1, 'pageSize': 25, 'search': 'west chester'},
+    'auctions_large_page': {'page': 1, 'pageSize': 500},
+}
+
+
+class Stages:
+    """Wall time and a count per stage, in the order they ran."""
+
+    def __init__(self):
+        self.seconds = {}
+        self.counts = {}
+
+    def run(self, name, func, *args, count=len):
+        started = time.perf_counter()
+        result = func(*args)
+        self.seconds[name] = time.perf_counter() - started
+        self.counts[name] = count(result)
+        print(f"{name}: {self.seconds[name]:.2f}s ({self.counts[name]})", flush=True)
+        return result
+
+
+def count_records(records):
+    return sum(len(county_records) for county_records in records.values())
+
+
+def parse_property_lists(store, counties):
+    return {county.url: list(iter_property_list(store.property_list(county.url), county)) for county in counties}
+
+
+def save_records(records):
+    saved = 0
+    for url, county_records in records.items():
+        stats = sync_bids_records(county_records, url)
+        saved += len(stats['delta']['new']) + len(stats['delta']['changed'])
+    return saved
+
+
+def fetch_details(auction_ids):
+    with ThreadPoolExecutor(max_workers=DETAIL_FETCH_WORKERS) as executor:
+        return [details for details in executor.map(fetch_other_values, auction_ids) if details]
+
+
+def crawl_zestimates(workers):
+    with tempfile.TemporaryDirectory() as directory:
+        queue_path, cache_path = os.path.join(directory, 'queue.sqlite'), os.path.join(directory, 'cache.sqlite')
+        with ZillowCrawler(workers, queue_path=queue_path, cache_path=cache_path) as crawler:
+            crawler.enqueue_new_rows()
+            crawler.drain()
+            return crawler.writer.written
+
+
+def time_auctions(client, params, repeat):
+    """Median milliseconds for a response cache miss (a new page each time) and for a hit."""
+    misses, hits = [], []
+    for attempt in range(repeat):
+        started = time.perf_counter()
+        client.get('/auctions', params=dict(params, page=params['page'] + attempt + 1)).raise_for_status()
+        misses.append(time.perf_counter() - started)
+    for _ in range(repeat):
+        started = time.perf_counter()
+        client.get('/auctions', params=params).raise_for_status()
+        hits.append(time.perf_counter() - started)
+    return statistics.median(misses) * 1000, statistics.median(hits) * 1000
+
+
+def run(store, counties, args):
+    stages = Stages()
+    with replay_environment(store, latency=args.latency, rate_limit=args.rate_limit, keep_database=args.keep_database) as (proxy, _):
+        records = stages.run('parse_property_lists', parse_property_lists, store, counties, count=count_records)
+        stages.run('save_new', save_records, records, count=int)
+        stages.run('save_unchanged', save_records, records, count=int)
+        auction_ids = [record[0] for county_records in records.values() for record in county_records]
+        stages.run('detail_pages', fetch_details, auction_ids[:args.details])
+        stages.run('zillow_crawler', crawl_zestimates, args.workers, count=int)
+
+        api_ms = {}
+        # The TestClient runs the API's startup: async pool and search index check on the replay database
+        with TestClient(app) as client:
+            for name, params in AUCTIONS_QUERIES.items():
+                api_ms[f'{name}_miss'], api_ms[f'{name}_hit'] = time_auctions(client, params, args.repeat)
+        fixture_stats = dict(proxy.stats)
+
+    return {
+        'finished_at': datetime.now().isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'settings': {'rows': count_records(records),
+                     'counties': len(counties), 'latency': args.latency, 'workers': args.workers,
+                     'details': args.details, 'repeat': args.repeat},
+        'stages': stages.seconds,
+        'counts': stages.counts,
+        'api_ms': api_ms,
+        'fixture_proxy': fixture_stats,
+        'pipeline_stage_seconds': metrics.snapshot().get('pipeline_stage_seconds', {}),
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def previous_run(path):
+    try:
+        with open(path) as file:
+            lines = [line for line in file if line.strip()]
+    except OSError:
+        return None
+    return json.loads(lines[-1]) if lines else None
+
+
+def print_report(result, previous):
+    if previous:
+        print(f"Compared with {previous['finished_at']} ({previous.get('commit')}, {previous['settings']})")
+    print(f"{'stage':<32}{'now':>10}{'before':>10}{'change':>9}")
+    for section, unit in (('stages', 's'), ('api_ms', 'ms')):
+        before = previous.get(section, {}) if previous else {}
+        for name, value in result[section].items():
+            line = f"{name:<32}{value:>9.2f}{unit}"
+            if before.get(name):
+                line += f"{before[name]:>9.2f}{unit}{(value / before[name] - 1) * 100:>+8.1f}%"
+            print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--fixtures', help="recorded fixtures directory; synthetic ones are generated if omitted")
+    parser.add_argument('--rows', type=int, default=500, help="rows per county for synthetic fixtures")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds the fixture proxy waits before each response")
+    parser.add_argument('--rate-limit', type=float, default=None, help="per-host requests/second (default: unthrottled)")
+    parser.add_argument('--workers', type=int, default=ZILLOW_MAX_WORKERS)
+    parser.add_argument('--details', type=int, default=500, help="auction detail pages to fetch")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--history', default=HISTORY_PATH)
+    parser.add_argument('--keep-database', action='store_true')
+    args = parser.parse_args()
+
+    # Per-row INFO logs would dominate the timings
+    log.setLevel(logging.WARNING)
+    with tempfile.TemporaryDirectory() as directory:
+        store = FixtureStore(args.fixtures or directory)
+        counties = [county for county in enabled_counties() if county.strategy == 'property_list']
+        if not args.fixtures:
+            generate_fixtures(store, counties, args.rows, args.seed)
+        counties = [county for county in counties if store.property_list(county.url)]
+        result = run(store, counties, args)
+
+    print_report(result, previous_run(args.history))
+    with open(args.history, 'a') as file:
+        file.write(json.dumps(result, default=str) + '\n')
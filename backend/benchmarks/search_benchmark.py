@@ -0,0 +1,128 @@
+"""
+Compares the old 13-column LOWER(...) LIKE search with auction_search.build_search.
+
+Fills a scratch table with generated auctions (1M rows by default), adds the
+FULLTEXT index, then times COUNT(*) and a first page for a set of search terms
+with each strategy. Point credentials.CONFIG at a throwaway database first.
+
+    python benchmarks/search_benchmark.py --rows 1000000 --repeat 5
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from functools import partial
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from auction_search import FULLTEXT_INDEX_DDL, build_like_search, build_search  # noqa: E402
+from setup import MySQLConnection  # noqa: E402
+
+TABLE = 'auction_data_search_bench'
+STREETS = ['Main', 'Market', 'High', 'Church', 'Walnut', 'Chestnut', 'Oak', 'Maple', 'Gay', 'Lincoln', 'Penn', 'Ridge']
+SUFFIXES = ['St', 'Ave', 'Rd', 'Ln', 'Dr', 'Pike']
+CITIES = ['West Chester', 'Norristown', 'Reading', 'Philadelphia', 'Phoenixville', 'Pottstown', 'Lansdale', 'Coatesville']
+COUNTIES = ['Chester', 'Montgomery', 'Berks', 'Philadelphia']
+REMARKS = ['', 'Phila tax', 'Phila foreclosure']
+SEARCHES = ['chestnut', 'west chester', '123 main', 'phila tax', '19380', 'reading', '250000']
+
+
+def create_table(cursor):
+    cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+    cursor.execute(f"""
+        CREATE TABLE {TABLE} (
+            auction_id BIGINT PRIMARY KEY,
+            bid DECIMAL(14, 2),
+            bid_open_date DATETIME,
+            bid_closing_date DATETIME,
+            debt DECIMAL(14, 2),
+            address VARCHAR(255),
+            crawl_date DATETIME,
+            city VARCHAR(100),
+            state VARCHAR(8),
+            county VARCHAR(100),
+            remark VARCHAR(100),
+            v_o DOUBLE,
+            zestimate DOUBLE,
+            created_at DATETIME,
+            KEY idx_crawl_date (crawl_date)
+        )
+    """)
+
+
+def generate_rows(count, start_id):
+    now = datetime.now()
+    for auction_id in range(start_id, start_id + count):
+        city = random.choice(CITIES)
+        opens = now + timedelta(days=random.randint(0, 60))
+        debt = round(random.uniform(5000, 400000), 2)
+        zestimate = float(random.randint(50, 900) * 1000)
+        yield (
+            auction_id, round(random.uniform(1000, 100000), 2), opens, opens + timedelta(days=7), debt,
+            f"{random.randint(1, 9999)} {random.choice(STREETS)} {random.choice(SUFFIXES)} {city} PA {random.randint(19000, 19600)}",
+            now, city, 'PA', random.choice(COUNTIES), random.choice(REMARKS), zestimate / debt, zestimate, now,
+        )
+
+
+def fill_table(rows, batch_size=5000):
+    insert = f"INSERT INTO {TABLE} VALUES ({', '.join(['%s'] * 14)})"
+    for start in range(0, rows, batch_size):
+        with MySQLConnection() as cursor:
+            cursor.executemany(insert, list(generate_rows(min(batch_size, rows - start), start + 1)))
+        print(f"\rInserted {min(start + batch_size, rows)}/{rows} rows", end='', flush=True)
+    print()
+
+
+def time_query(query, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        with MySQLConnection() as cursor:
+            started = time.perf_counter()
+            cursor.execute(query, params)
+            cursor.fetchall()
+            timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def run(repeat):
+    base_params = [datetime.now() - timedelta(hours=20)]
+    print(f"{'search':<16}{'strategy':<10}{'count ms':>10}{'page ms':>10}{'matches':>10}")
+    for search in SEARCHES:
+        for name, builder in (('like', build_like_search), ('fulltext', partial(build_search, table=TABLE))):
+            where, params = builder(search)
+            params = base_params + params
+            count_query = f"SELECT COUNT(*) FROM {TABLE} WHERE crawl_date >= %s AND {where}"
+            page_query = f"SELECT * FROM {TABLE} WHERE crawl_date >= %s AND {where} ORDER BY auction_id LIMIT 25"
+            with MySQLConnection() as cursor:
+                cursor.execute(count_query, params)
+                (matches,) = cursor.fetchone()
+            count_ms = time_query(count_query, params, repeat) * 1000
+            page_ms = time_query(page_query, params, repeat) * 1000
+            print(f"{search:<16}{name:<10}{count_ms:>10.1f}{page_ms:>10.1f}{matches:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--keep', action='store_true', help="keep the generated table for later runs")
+    parser.add_argument('--reuse', action='store_true', help="reuse a table kept by a previous run")
+    args = parser.parse_args()
+
+    if not args.reuse:
+        with MySQLConnection() as cursor:
+            create_table(cursor)
+        fill_table(args.rows)
+        with MySQLConnection() as cursor:
+            started = time.perf_counter()
+            cursor.execute(FULLTEXT_INDEX_DDL.format(table=TABLE))
+            print(f"Built FULLTEXT index in {time.perf_counter() - started:.1f}s")
+
+    run(args.repeat)
+
+    if not args.keep:
+        with MySQLConnection() as cursor:
+            cursor.execute(f"DROP TABLE {TABLE}")
@@ -0,0 +1,125 @@
+"""
+Compares the previous pandas property list parser with the streaming
+bids_scraper.iter_property_list on a synthetic sheet (100k rows by default).
+
+Reports wall time and peak traced memory for each (the pandas figure includes
+the iterrows pass save_bids_data used to make), and checks that both produce
+the same rows.
+
+    python benchmarks/xlsx_ingest_benchmark.py --rows 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from openpyxl import Workbook  # noqa: E402
+
+from bids_scraper import iter_property_list, process_dataframe  # noqa: E402
+from counties import get_county  # noqa: E402
+
+URL = "https://www.bid4assets.com/chestercopasheriffsales"
+HEADERS = ['Auction ID', 'Minimum Bid', 'Bidding Open Date/Time', 'Bidding Closing Date/Time',
+           'Debt Amount', 'Address', 'Parcel Number', 'Status']
+
+
+def write_sheet(path, rows):
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append(['Chester County Sheriff Sale'])
+    sheet.append([f"Generated {datetime.now():%m/%d/%Y}"])
+    sheet.append(HEADERS)
+    opens = datetime(2024, 5, 1, 10)
+    for auction_id in range(1, rows + 1):
+        open_date = opens + timedelta(hours=random.randint(0, 2000))
+        sheet.append([
+            auction_id,
+            round(random.uniform(1000, 100000), 2),
+            open_date.strftime('%m/%d/%Y %I:%M:%S %p'),
+            (open_date + timedelta(days=7)).strftime('%m/%d/%Y %I:%M:%S %p'),
+            round(random.uniform(5000, 400000), 2) if random.random() > 0.1 else None,
+            f"{random.randint(1, 9999)} Main St West Chester PA 19380",
+            f"{random.randint(10, 99)}-{random.randint(1, 9)}-{random.randint(100, 999)}",
+            'Active',
+        ])
+    workbook.save(path)
+
+
+def parse_with_pandas(path):
+    """The parser used before streaming ingestion."""
+    county = get_county(URL)
+    df = pd.read_excel(path, skiprows=2)
+    cols = county.columns
+    df = df[[key for key, _ in cols.items()]]
+    df.rename(columns=cols, inplace=True)
+    df = process_dataframe(df, county.county)
+    df['remark'] = county.remark
+    df['bid_open_date'] = pd.to_datetime(df['bid_open_date'], format='%m/%d/%Y %I:%M:%S %p')
+    df['bid_closing_date'] = pd.to_datetime(df['bid_closing_date'], format='%m/%d/%Y %I:%M:%S %p')
+    df['bid_open_date'] = df['bid_open_date'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    df['bid_closing_date'] = df['bid_closing_date'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    df = df.replace({np.nan: None})
+    # What save_bids_data walked over afterwards
+    return [
+        (row['id'], row['bid'], row['bid_open_date'], row['bid_closing_date'], row.get('debt'), row['address'])
+        for _, row in df.iterrows()
+    ]
+
+
+def parse_streaming(path, batch_size=500, keep_rows=True):
+    rows = []
+    batch = []
+    for record in iter_property_list(path, URL):
+        batch.append(record)
+        if len(batch) >= batch_size:
+            # Stand-in for the DB writer, which only ever holds one batch
+            if keep_rows:
+                rows.extend(tuple(r)[:6] for r in batch)
+            batch = []
+    if keep_rows:
+        rows.extend(tuple(r)[:6] for r in batch)
+    return rows
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def peak_memory(func, *args, **kwargs):
+    tracemalloc.start()
+    func(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'chester.xlsx')
+        started = time.perf_counter()
+        write_sheet(path, args.rows)
+        print(f"Generated {args.rows} rows ({os.path.getsize(path) / 1e6:.1f} MB) in {time.perf_counter() - started:.1f}s")
+
+        expected, pandas_time = timed(parse_with_pandas, path)
+        actual, stream_time = timed(parse_streaming, path)
+        pandas_peak = peak_memory(parse_with_pandas, path)
+        stream_peak = peak_memory(parse_streaming, path, keep_rows=False)
+
+    print(f"{'parser':<12}{'seconds':>10}{'peak MB':>10}")
+    print(f"{'pandas':<12}{pandas_time:>10.2f}{pandas_peak / 1e6:>10.1f}")
+    print(f"{'streaming':<12}{stream_time:>10.2f}{stream_peak / 1e6:>10.1f}")
+    print(f"Rows match: {expected == actual} ({len(actual)} rows)")
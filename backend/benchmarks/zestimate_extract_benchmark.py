@@ -0,0 +1,69 @@
+"""
+Compares zestimate extraction tiers on saved Zillow pages (e.g. those written by
+zillow_scraper.save_html into html_pages/).
+
+For every page it times the BeautifulSoup heuristics alone and the fast path with
+soup fallback, and reports how often the fast path answered and whether it agreed
+with the soup result.
+
+    python benchmarks/zestimate_extract_benchmark.py html_pages --repeat 5
+"""
+import argparse
+import glob
+import logging
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from setup import clean_monetary_string, log  # noqa: E402
+from zillow_scraper import extract_zestimate_fast, extract_zestimate_soup  # noqa: E402
+
+
+def run(extractor, html, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        try:
+            result = extractor(html)
+        except Exception:
+            result = None
+        timings.append(time.perf_counter() - started)
+    return clean_monetary_string(result) if result else None, statistics.median(timings)
+
+
+def extract_tiered(html):
+    return extract_zestimate_fast(html) or extract_zestimate_soup(html, '')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('directory', nargs='?', default='html_pages')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    paths = sorted(glob.glob(os.path.join(args.directory, '*.htm*')))
+    if not paths:
+        sys.exit(f"No .html pages found in {args.directory}")
+    log.setLevel(logging.WARNING)
+
+    soup_total = tiered_total = 0.0
+    fast_hits = agree = 0
+    for path in paths:
+        with open(path, encoding='utf-8') as file:
+            html = file.read()
+        soup_value, soup_time = run(lambda h: extract_zestimate_soup(h, ''), html, args.repeat)
+        tiered_value, tiered_time = run(extract_tiered, html, args.repeat)
+        fast_hits += extract_zestimate_fast(html) is not None
+        agree += soup_value == tiered_value
+        soup_total += soup_time
+        tiered_total += tiered_time
+        print(f"{os.path.basename(path):<40}{soup_time * 1000:>10.2f}ms{tiered_time * 1000:>10.2f}ms  "
+              f"soup={soup_value} tiered={tiered_value}")
+
+    print(f"\n{len(paths)} pages: soup {soup_total * 1000:.1f}ms, tiered {tiered_total * 1000:.1f}ms "
+          f"({soup_total / tiered_total if tiered_total else 0:.1f}x)")
+    print(f"Fast path answered {fast_hits}/{len(paths)}; results agree on {agree}/{len(paths)}")
@@ -1,24 +1,30 @@
 from datetime import datetime, timedelta
 import io
 import os
-import re
 import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from urllib.parse import urljoin
 from credentials import BIDS_USERNAME, BIDS_PASSWORD, DOWNLOAD_PATH
 from bs4 import BeautifulSoup
-from setup import MySQLConnection, clean_monetary_string, get_driver, get_remark, log, proxied_request, retry, url_to_col_name, url_to_county
+from auction_id_index import AuctionIdIndex
+from counties import get_county
+from parsing import CITY_STATE_PATTERN, clean_monetary_series
+from metrics import metrics, stage_timer
+from setup import get_driver, log, proxied_request, retry
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException, ElementClickInterceptedException
+from selenium.common.exceptions import NoSuchElementException, ElementClickInterceptedException, WebDriverException
 import pandas as pd
 import numpy as np
+from openpyxl import load_workbook
+import requests
 
 
 def extract_city_state(address):
-    # Regular expression to match the city and state at the end of the address
-    pattern = r'([^,]+),?\s+([A-Za-z\s]+)\s+([A-Z]{2})\s+\d{5}$'
-    
-    match = re.search(pattern, address.strip())
+    match = CITY_STATE_PATTERN.search(address.strip())
     if match:
         city = match.group(2).strip().title()
         state = match.group(3)
@@ -26,19 +32,13 @@ def extract_city_state(address):
     else:
         return None, None
 
-def fetch_existing_auction_ids():
-    log.info("Fetching existing auction IDs from the database.")
-    with MySQLConnection() as cursor:
-        query = "SELECT auction_id FROM auction_data"
-        cursor.execute(query)
-        
-        result = cursor.fetchall()
-        log.info(f"Fetched {len(result)} auction IDs.")
-        return {row[0] for row in result}
+# Auction detail pages fetched concurrently by fetch_bids_data
+DETAIL_FETCH_WORKERS = 8
+AUCTION_DETAIL_URL = "https://www.bid4assets.com/auction/index/{}"
 
 @retry(max_retry_count=1, interval_sec=5)
 def fetch_other_values(auction_id):
-    url = f"https://www.bid4assets.com/auction/index/{auction_id}"
+    url = AUCTION_DETAIL_URL.format(auction_id)
     log.info(f"Fetching debt value from {url}")
     response = proxied_request(url)
     soup = BeautifulSoup(response.text, 'html.parser')
@@ -61,10 +61,9 @@ def fetch_other_values(auction_id):
 @retry(max_retry_count=2, interval_sec=10)
 def fetch_bids_data(url):
     log.info(f"Starting to scrape data from {url}.")
-    existing_auction_ids = fetch_existing_auction_ids()
-    log.info(f"Existing auction_ids {existing_auction_ids}")
+    existing_auction_ids = AuctionIdIndex().refresh()
     stop_scraping = False
-    data = []
+    table_rows = []
     with get_driver() as driver:
         driver.get(url)
         wait = WebDriverWait(driver, 10)
@@ -99,11 +98,9 @@ def fetch_bids_data(url):
                     break
                 address = cols[address_index].text.strip()
                 current_bid = cols[curremt_bid_index].text.strip()
-                debt, county = fetch_other_values(auction_id)
                 current_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                city, state = extract_city_state(address)
-                data.append([auction_id, address, clean_monetary_string(current_bid), clean_monetary_string(debt), county, city, state, current_date])
-            log.info(f"Rows length after this page {len(data)}")
+                table_rows.append((auction_id, address, current_bid, current_date))
+            log.info(f"Rows length after this page {len(table_rows)}")
             if stop_scraping:
                 break
             try:
@@ -118,10 +115,26 @@ def fetch_bids_data(url):
             except (NoSuchElementException, ElementClickInterceptedException):
                 log.warning("Next button not found or click intercepted.")
                 break
-    
-    page_data = pd.DataFrame(data, columns=['auction_id', 'address', 'current_bid', 'debt', 'county', 'city', 'state', 'date'])
-    page_data = page_data.replace({np.nan: None})
-    log.info(f"Scraped {len(data)} rows of data.")
+
+    # Detail pages go through the proxy, so fetch them in parallel once the table is read
+    with ThreadPoolExecutor(max_workers=DETAIL_FETCH_WORKERS) as executor:
+        details = [other_values or (None, None) for other_values in executor.map(fetch_other_values, [row[0] for row in table_rows])]
+
+    page_data = pd.DataFrame(table_rows, columns=['auction_id', 'address', 'current_bid', 'date'])
+    page_data['debt'] = [debt for debt, _ in details]
+    page_data['county'] = [county for _, county in details]
+    page_data['current_bid'], bad_bids = clean_monetary_series(page_data['current_bid'])
+    page_data['debt'], _ = clean_monetary_series(page_data['debt'])
+    places = [extract_city_state(address) for address in page_data['address']]
+    page_data['city'] = [city for city, _ in places]
+    page_data['state'] = [state for _, state in places]
+    unmatched = sum(state is None for _, state in places)
+    if bad_bids.any() or unmatched:
+        log.warning(f"Unparsed values: {bad_bids.sum()} bids, {unmatched} addresses without city/state")
+
+    page_data = page_data[['auction_id', 'address', 'current_bid', 'debt', 'county', 'city', 'state', 'date']]
+    page_data = page_data.astype(object).replace({np.nan: None})
+    log.info(f"Scraped {len(page_data)} rows of data.")
     return page_data
 
 
@@ -143,10 +156,17 @@ def convert_date_format(date_str):
         return None
 
 
+LOGIN_URL = 'https://www.bid4assets.com/myaccount/login?returnUrl=%2Fmyb4a'
+
+
+def on_login_page(driver):
+    return '/myaccount/login' in driver.current_url.lower()
+
+
 @retry(max_retry_count=10, interval_sec=10)
 def login(driver):
     log.info("Logging in")
-    driver.get('https://www.bid4assets.com/myaccount/login?returnUrl=%2Fmyb4a')
+    driver.get(LOGIN_URL)
     email_input = WebDriverWait(driver, 10).until(
         EC.presence_of_element_located((By.ID, "Username"))
     )
@@ -158,53 +178,387 @@ def login(driver):
     login_button = WebDriverWait(driver, 10).until(
         EC.element_to_be_clickable((By.ID, "bttnLoginSubmit"))
     )
-    time.sleep(1)
     login_button.click()
-    time.sleep(5)
+    WebDriverWait(driver, 15).until(lambda d: not on_login_page(d))
+    return True
+
+
+# Browser-like User-Agent for the plain HTTP session
+HTTP_USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+HTTP_TIMEOUT = 60
+
+
+def form_fields(form):
+    """Name/value pairs a browser would submit for `form` (excluding submit buttons)."""
+    fields = {}
+    for field in form.find_all(['input', 'select', 'textarea']):
+        name = field.get('name')
+        if not name:
+            continue
+        if field.name == 'select':
+            option = field.find('option', selected=True) or field.find('option')
+            fields[name] = option.get('value', option.get_text()) if option else ''
+        elif field.name == 'textarea':
+            fields[name] = field.get_text()
+        else:
+            field_type = (field.get('type') or 'text').lower()
+            if field_type in ('submit', 'button', 'image', 'reset'):
+                continue
+            if field_type in ('checkbox', 'radio') and not field.has_attr('checked'):
+                continue
+            fields[name] = field.get('value', '')
+    return fields
+
+
+def http_login(http):
+    response = http.get(LOGIN_URL, timeout=HTTP_TIMEOUT)
+    soup = BeautifulSoup(response.text, 'html.parser')
+    username = soup.find(id='Username')
+    form = username.find_parent('form') if username else None
+    if form is None:
+        return False
+    fields = form_fields(form)
+    fields[username.get('name', 'Username')] = BIDS_USERNAME
+    password = form.find(id='Password')
+    fields[password.get('name', 'Password') if password else 'Password'] = BIDS_PASSWORD
+    action = urljoin(response.url, form.get('action') or response.url)
+    response = http.post(action, data=fields, timeout=HTTP_TIMEOUT)
+    return response.ok and '/myaccount/login' not in response.url.lower()
+
+
+class BidsSession:
+    """
+    bid4assets session shared by every county scrape in a run. Downloads go over a
+    plain requests session when possible; the headless Chrome is only started for
+    the Selenium fallback. Both log in lazily, and the browser logs in again only when
+    a page bounces back to the login form (session expired) or the browser has died.
+    """
+
+    def __init__(self):
+        self.driver = None
+        self.http = None
+        self.logged_in = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def start(self):
+        with stage_timer.time(stage='browser_start'):
+            self.driver_context = get_driver()
+            self.driver = self.driver_context.__enter__()
+        self.logged_in = False
+
+    def stop(self):
+        if self.driver is None:
+            return
+        try:
+            self.driver_context.__exit__(None, None, None)
+        except WebDriverException as e:
+            log.warning(f"Error closing browser: {e}")
+        self.driver = None
+
+    def alive(self):
+        if self.driver is None:
+            return False
+        try:
+            self.driver.current_url
+            return True
+        except WebDriverException:
+            return False
+
+    def login(self):
+        with stage_timer.time(stage='browser_login'):
+            self.logged_in = bool(login(self.driver))
+        if not self.logged_in:
+            raise Exception("Could not log in to bid4assets")
+
+    def get(self, url):
+        if not self.alive():
+            if self.driver is not None:
+                log.warning("Browser session died, starting a new one")
+                self.stop()
+            self.start()
+        if not self.logged_in:
+            self.login()
+        self.driver.get(url)
+        if on_login_page(self.driver):
+            log.info("bid4assets session expired, logging in again")
+            self.login()
+            self.driver.get(url)
+
+    def http_session(self):
+        """Logged-in requests session, reusing the browser's cookies if it is already logged in."""
+        if self.http is not None:
+            return self.http
+        http = requests.Session()
+        if self.logged_in and self.alive():
+            http.headers['User-Agent'] = self.driver.execute_script("return navigator.userAgent")
+            for cookie in self.driver.get_cookies():
+                http.cookies.set(cookie['name'], cookie['value'], domain=cookie.get('domain'), path=cookie.get('path', '/'))
+        else:
+            http.headers['User-Agent'] = HTTP_USER_AGENT
+            try:
+                with stage_timer.time(stage='http_login'):
+                    logged_in = http_login(http)
+                if not logged_in:
+                    log.warning("HTTP login to bid4assets failed")
+                    return None
+            except requests.RequestException as e:
+                log.warning(f"HTTP login to bid4assets failed: {e}")
+                return None
+        self.http = http
+        return self.http
+
+
+def download_property_list_http(url, session):
+    """
+    Submits the property list download form over plain HTTP and returns the XLSX
+    in memory, or None if anything doesn't look right (the caller falls back to Chrome).
+    """
+    http = session.http_session()
+    if http is None:
+        return None
+    try:
+        response = http.get(url, timeout=HTTP_TIMEOUT)
+        if '/myaccount/login' in response.url.lower():
+            log.info("HTTP session is not logged in any more")
+            session.http = None
+            return None
+        soup = BeautifulSoup(response.text, 'html.parser')
+        button = soup.find(id='bttnDownload')
+        form = button.find_parent('form') if button else None
+        if form is None:
+            log.warning(f"No download form found on {url}")
+            return None
+
+        fields = form_fields(form)
+        if button.get('name'):
+            fields[button['name']] = button.get('value', '')
+        action = urljoin(response.url, form.get('action') or response.url)
+        if (form.get('method') or 'get').lower() == 'post':
+            download = http.post(action, data=fields, stream=True, timeout=HTTP_TIMEOUT)
+        else:
+            download = http.get(action, params=fields, stream=True, timeout=HTTP_TIMEOUT)
+
+        with download:
+            download.raise_for_status()
+            content = io.BytesIO()
+            for chunk in download.iter_content(chunk_size=64 * 1024):
+                content.write(chunk)
+    except requests.RequestException as e:
+        log.warning(f"HTTP download from {url} failed: {e}")
+        return None
+
+    # XLSX files are zip archives
+    if not content.getvalue().startswith(b'PK'):
+        log.warning(f"HTTP download from {url} did not return a spreadsheet")
+        return None
+    content.seek(0)
+    log.info(f"Downloaded {content.getbuffer().nbytes} bytes over HTTP from {url}")
+    return content
+
+
+# Browser downloads: give up if no complete file appears within DOWNLOAD_TIMEOUT seconds.
+DOWNLOAD_TIMEOUT = 120
+DOWNLOAD_POLL_INTERVAL = 0.5
+# A file is complete once its size has stayed the same for this many polls.
+DOWNLOAD_STABLE_POLLS = 2
+PARTIAL_DOWNLOAD_SUFFIXES = ('.crdownload', '.tmp', '.part')
+
+
+def county_download_dir(raw_url):
+    """Per-source download directory, so concurrent downloads never see each other's files."""
+    slug = raw_url.rstrip('/').rsplit('/', 1)[-1].lower()
+    directory = os.path.join(DOWNLOAD_PATH, slug)
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def wait_for_download(directory, existing=(), timeout=DOWNLOAD_TIMEOUT):
+    """
+    Polls `directory` until a file that isn't in `existing` has finished downloading
+    (no partial download files left and its size is stable) and returns its path.
+    """
+    existing = set(existing)
+    deadline = time.monotonic() + timeout
+    last_size, stable_polls = None, 0
+    while time.monotonic() < deadline:
+        names = set(os.listdir(directory)) - existing
+        partial = [name for name in names if name.endswith(PARTIAL_DOWNLOAD_SUFFIXES)]
+        finished = [os.path.join(directory, name) for name in names if not name.endswith(PARTIAL_DOWNLOAD_SUFFIXES)]
+        if finished and not partial:
+            path = max(finished, key=os.path.getmtime)
+            size = os.path.getsize(path)
+            if size > 0 and size == last_size:
+                stable_polls += 1
+                if stable_polls >= DOWNLOAD_STABLE_POLLS:
+                    return path
+            else:
+                stable_polls = 0
+            last_size = size
+        time.sleep(DOWNLOAD_POLL_INTERVAL)
+    raise TimeoutError(f"No completed download in {directory} after {timeout}s")
+
+
+def download_property_list_browser(url, session, raw_url):
+    """Clicks the download button in Chrome and returns the path of the downloaded file."""
+    session.get(url)
+    driver = session.driver
+    directory = county_download_dir(raw_url)
+    driver.execute_cdp_cmd("Browser.setDownloadBehavior", {"behavior": "allow", "downloadPath": directory})
+    # dates_raw = driver.find_element(By.ID, "SelectedSaleDateId")
+    # options = dates_raw.find_elements(By.TAG_NAME, "option")
+    # dates = [date.text for date in options]
+    # dates = [convert_date_format(date.strip()) for date in dates]
+    # for date in dates:
+    #     if date:
+    #         download_page_url = url + f'?salesdate={date}'
+    #         log.info(f"Downloading file from {download_page_url}")
+    #         driver.get(download_page_url)
+    #         time.sleep(5)
+    existing = os.listdir(directory)
+    download_button = WebDriverWait(driver, 30).until(
+        EC.element_to_be_clickable((By.ID, "bttnDownload"))
+    )
+    download_button.click()
+    with stage_timer.time(stage='download_wait'):
+        path = wait_for_download(directory, existing)
+    log.info(f"File downloaded: {path}")
+    return path
+
+
+BidRecord = namedtuple('BidRecord', [
+    'id', 'bid', 'bid_open_date', 'bid_closing_date', 'debt', 'address',
+    'crawl_date', 'city', 'state', 'county', 'remark',
+])
+
+rows_parsed = metrics.counter('bids_rows_parsed_total', 'Auction rows read from property list spreadsheets')
+
+DB_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+@lru_cache(maxsize=4096)
+def convert_sheet_date_string(value, date_formats):
+    # Auctions in a list share a handful of open/close times, so this is mostly cache hits
+    value = value.strip()
+    if not value:
+        return None
+    for date_format in date_formats:
+        try:
+            return datetime.strptime(value, date_format).strftime(DB_DATE_FORMAT)
+        except ValueError:
+            pass
+    raise ValueError(f"Date {value!r} matches none of {date_formats}")
+
+
+def convert_sheet_date(value, date_formats):
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return convert_sheet_date_string(value, date_formats)
+    return value.strftime(DB_DATE_FORMAT)
+
+
+def dedupe_headers(headers):
+    """Names repeated headers 'X', 'X.1', 'X.2', ... the way pandas does."""
+    seen = {}
+    result = []
+    for header in headers:
+        name = '' if header is None else str(header)
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        result.append(f"{name}.{count}" if count else name)
+    return result
+
+
+def iter_property_list(source, county):
+    """
+    Streams a property list spreadsheet (path or file-like) row by row with openpyxl's
+    read-only reader and yields a BidRecord per auction, so memory stays flat no matter
+    how long the list is. `county` is a counties.County or its URL.
+    """
+    if isinstance(county, str):
+        county = get_county(county)
+    cols, date_formats = county.columns, county.date_formats
+    state, remark = county.state, county.remark
+    crawl_date = datetime.now().strftime(DB_DATE_FORMAT)
+
+    # Time spent here, not in the consumer between rows
+    started = time.monotonic()
+    parse_seconds = 0.0
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(min_row=county.header_row, values_only=True)
+        headers = dedupe_headers(next(rows, ()))
+        missing = [header for header in cols if header not in headers]
+        if missing:
+            raise KeyError(f"Columns {missing} not found in the {county.county} property list")
+        positions = {column: headers.index(header) for header, column in cols.items()}
+        width = len(headers)
+        id_at, bid_at, address_at = positions['id'], positions['bid'], positions['address']
+        open_at, close_at = positions['bid_open_date'], positions['bid_closing_date']
+        debt_at = positions.get('debt')
+
+        total = 0
+        for row in rows:
+            if len(row) < width:
+                row = row + (None,) * (width - len(row))
+            if all(row[position] is None for position in positions.values()):
+                continue
+            total += 1
+            record = BidRecord(
+                row[id_at], row[bid_at],
+                convert_sheet_date(row[open_at], date_formats), convert_sheet_date(row[close_at], date_formats),
+                row[debt_at] if debt_at is not None else None, row[address_at],
+                crawl_date, county.county, state, county.county, remark,
+            )
+            parse_seconds += time.monotonic() - started
+            yield record
+            started = time.monotonic()
+        log.info(f"Read property list for {county.county}. Total rows: {total}")
+        rows_parsed.inc(total, county=county.county)
+    finally:
+        workbook.close()
+        stage_timer.observe(parse_seconds + time.monotonic() - started, stage='xlsx_parse')
+
 
 @retry(max_retry_count=3, interval_sec=10)
-def scrape_bids_data(raw_url):
-    county = url_to_county(raw_url)
+def download_property_list(raw_url, session):
+    """Returns the property list as an in-memory file, or the path of a browser download."""
     url = raw_url+'/propertylistdownload'
     log.info(f"Starting to scrape data from {url}.")
-    with get_driver() as driver:
-        login(driver)
-        driver.get(url)
-        time.sleep(5)
-        all_dfs = []
-        # dates_raw = driver.find_element(By.ID, "SelectedSaleDateId")
-        # options = dates_raw.find_elements(By.TAG_NAME, "option")
-        # dates = [date.text for date in options]
-        # dates = [convert_date_format(date.strip()) for date in dates]
-        # for date in dates:
-        #     if date:
-        #         download_page_url = url + f'?salesdate={date}'
-        #         log.info(f"Downloading file from {download_page_url}")
-        #         driver.get(download_page_url)
-        #         time.sleep(5)
-        download_button = driver.find_element(By.ID, "bttnDownload")
-        download_button.click()
-        log.info('File downloaded.')
-        time.sleep(10)
-        downloaded_files = os.listdir(DOWNLOAD_PATH)
-        downloaded_files = sorted(downloaded_files, key=lambda x: os.path.getmtime(os.path.join(DOWNLOAD_PATH, x)), reverse=True)
-        for file in downloaded_files:
-            if county.lower()[:4] in file.lower():
-                df = pd.read_excel(os.path.join(DOWNLOAD_PATH, file), skiprows=2)
-                log.info(f"Found downloaded file: {file}. Total rows: {len(df)}")
-                cols = url_to_col_name(raw_url)
-                df = df[[key for key, _ in cols.items()]]
-                df.rename(columns=cols, inplace=True)
-                df = process_dataframe(df, county)
-                df['remark'] = get_remark(raw_url)
-                all_dfs.append(df)
-                break
-        if all_dfs:
-            final_df = pd.concat(all_dfs, ignore_index=True)
-            final_df['bid_open_date'] = pd.to_datetime(final_df['bid_open_date'], format='%m/%d/%Y %I:%M:%S %p')
-            final_df['bid_closing_date'] = pd.to_datetime(final_df['bid_closing_date'], format='%m/%d/%Y %I:%M:%S %p')
-            final_df['bid_open_date'] = final_df['bid_open_date'].dt.strftime('%Y-%m-%d %H:%M:%S')
-            final_df['bid_closing_date'] = final_df['bid_closing_date'].dt.strftime('%Y-%m-%d %H:%M:%S')
-            final_df = final_df.replace({np.nan: None})
-            log.info("Data scraping and merging completed successfully.")
-            return final_df
\ No newline at end of file
+    with stage_timer.time(stage='download_http'):
+        source = download_property_list_http(url, session)
+    if source is None:
+        log.info(f"Falling back to the browser download for {url}")
+        with stage_timer.time(stage='download_browser'):
+            source = download_property_list_browser(url, session, raw_url)
+    return source
+
+
+def iter_listing(county):
+    """BidRecords for a county using the listing strategy (auction table read by fetch_bids_data)."""
+    df = fetch_bids_data(county.url)
+    if df is None:
+        return
+    for row in df.itertuples(index=False):
+        yield BidRecord(
+            int(row.auction_id), row.current_bid, None, None, row.debt, row.address, row.date,
+            row.city, row.state or county.state, row.county or county.county, county.remark,
+        )
+
+
+def scrape_bids_data(raw_url, session=None):
+    """Downloads a county's property list into a DataFrame (one column per BidRecord field)."""
+    if session is None:
+        with BidsSession() as session:
+            return scrape_bids_data(raw_url, session)
+    with stage_timer.time(stage='scrape_bids_data'):
+        source = download_property_list(raw_url, session)
+        if source is None:
+            return None
+        df = pd.DataFrame(list(iter_property_list(source, raw_url)), columns=BidRecord._fields)
+        return df.replace({np.nan: None})
@@ -0,0 +1,74 @@
+import json
+import os
+from collections import namedtuple
+from functools import lru_cache
+
+# Set COUNTIES_PATH to scrape from another registry (e.g. a subset while testing).
+COUNTIES_PATH = os.environ.get('COUNTIES_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'counties.json'))
+
+# property_list: download the county's XLSX property list (bids_scraper.download_property_list)
+# listing: read the auction table page by page in Chrome (bids_scraper.fetch_bids_data)
+STRATEGIES = ('property_list', 'listing')
+REQUIRED_COLUMNS = {'id', 'bid', 'bid_open_date', 'bid_closing_date', 'address'}
+
+County = namedtuple('County', [
+    'url', 'county', 'state', 'remark', 'strategy', 'header_row', 'date_formats', 'columns', 'enabled',
+])
+
+
+def parse_county(entry, defaults):
+    settings = dict(defaults, **entry)
+    missing = {'url', 'county'} - settings.keys()
+    if missing:
+        raise ValueError(f"County entry {entry} is missing {sorted(missing)}")
+    county = County(
+        url=settings['url'],
+        county=settings['county'],
+        state=settings.get('state', 'PA'),
+        remark=settings.get('remark', ''),
+        strategy=settings.get('strategy', 'property_list'),
+        header_row=int(settings.get('header_row', 1)),
+        date_formats=tuple(settings.get('date_formats', ())),
+        columns=dict(settings.get('columns', {})),
+        enabled=bool(settings.get('enabled', True)),
+    )
+    if county.strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {county.strategy!r} for {county.url}")
+    if county.strategy == 'property_list':
+        missing = REQUIRED_COLUMNS - set(county.columns.values())
+        if missing:
+            raise ValueError(f"Column map for {county.url} has no {sorted(missing)}")
+        if not county.date_formats:
+            raise ValueError(f"No date_formats for {county.url}")
+    return county
+
+
+def load_counties(path=COUNTIES_PATH):
+    """Reads and validates the registry file. Returns an ordered {url: County} dict."""
+    with open(path) as file:
+        config = json.load(file)
+    defaults = config.get('defaults', {})
+    counties = {}
+    for entry in config['counties']:
+        county = parse_county(entry, defaults)
+        if county.url in counties:
+            raise ValueError(f"County {county.url} is listed twice in {path}")
+        counties[county.url] = county
+    return counties
+
+
+@lru_cache(maxsize=None)
+def county_registry():
+    """The registry, loaded from COUNTIES_PATH on first use."""
+    return load_counties()
+
+
+def get_county(url):
+    try:
+        return county_registry()[url]
+    except KeyError:
+        raise KeyError(f"{url} is not in the county registry ({COUNTIES_PATH})")
+
+
+def enabled_counties():
+    return [county for county in county_registry().values() if county.enabled]
@@ -1,20 +1,20 @@
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
+import hashlib
+import json
 import os
+import queue
+import time
 import pandas as pd
-from bids_scraper import fetch_bids_data, scrape_bids_data
+from bids_scraper import BidsSession, download_property_list, iter_listing, iter_property_list
+from counties import enabled_counties
 from credentials import DOWNLOAD_PATH
-from zillow_scraper import zillow_crawler
-from setup import MySQLConnection, log
+from metrics import RUN_REPORT_PATH, metrics, stage_timer
+from zillow_scraper import ZILLOW_MAX_WORKERS, ZillowCrawler, fetch_crawlable_data
+from setup import MySQLConnection, bump_data_version, ensure_data_version_table, log, proxy_client
 
-urls = ["https://www.bid4assets.com/chestercopasheriffsales",
-        "https://www.bid4assets.com/MontcoPASheriff",
-        "https://www.bid4assets.com/berkscountysheriffsales",
-        "https://www.bid4assets.com/philataxsales",
-        "https://www.bid4assets.com/philaforeclosures"
-]
-
-def delete_files(directory, file_pattern=None):
+def delete_files(directory, file_pattern=None, recursive=False):
     """
     Deletes files in the specified directory. If a file pattern is provided, only files
     matching the pattern will be deleted. If no pattern is provided, all files in the
@@ -23,57 +23,332 @@ def delete_files(directory, file_pattern=None):
     Parameters:
     directory (str): The path to the directory where files will be deleted.
     file_pattern (str, optional): A pattern to match files to be deleted. Defaults to None.
+    recursive (bool, optional): Also delete matching files in subdirectories. Defaults to False.
     """
     try:
-        for filename in os.listdir(directory):
-            file_path = os.path.join(directory, filename)
-            if os.path.isfile(file_path):
+        for root, _, filenames in os.walk(directory):
+            for filename in filenames:
+                file_path = os.path.join(root, filename)
                 if file_pattern is None or file_pattern in filename:
                     os.remove(file_path)
                     log.info(f"Deleted file: {file_path}")
+            if not recursive:
+                break
     except Exception as e:
         log.error(f"Error deleting files: {e}")
 
-def save_bids_data(df):
+# Rows sent to MySQL per executemany round trip in save_bids_data.
+SAVE_BATCH_SIZE = 500
+
+saved_rows = metrics.counter('bids_rows_saved_total', 'Auction rows upserted, by result')
+delta_rows = metrics.counter('bids_delta_rows_total', 'Auction rows seen by incremental sync, by change')
+
+INSERT_BIDS_QUERY = """
+    INSERT INTO auction_data (
+        auction_id, bid, bid_open_date, bid_closing_date, debt, address, 
+        crawl_date, city, state, county, remark, created_at
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        bid = VALUES(bid),
+        bid_open_date = VALUES(bid_open_date),
+        bid_closing_date = VALUES(bid_closing_date),
+        debt = VALUES(debt),
+        address = VALUES(address),
+        crawl_date = VALUES(crawl_date),
+        city = VALUES(city),
+        state = VALUES(state),
+        county = VALUES(county),
+        remark = VALUES(remark),
+        -- Keep the old value if exists, otherwise use the new value
+        created_at = COALESCE(created_at, VALUES(created_at))
+"""
+
+
+def split_upsert_count(rows, affected):
+    """
+    MySQL reports 1 affected row per insert and 2 per update for ON DUPLICATE KEY UPDATE.
+    Every upsert rewrites crawl_date, so unchanged rows (0) don't occur in practice.
+    Returns (inserted, updated).
+    """
+    updated = min(max(affected - rows, 0), rows)
+    return rows - updated, updated
+
+
+def upsert_bids_batch(cursor, batch, stats):
+    try:
+        with stage_timer.time(stage='mysql_upsert'):
+            affected = cursor.executemany(INSERT_BIDS_QUERY, batch)
+        inserted, updated = split_upsert_count(len(batch), affected or 0)
+        stats['inserted'] += inserted
+        stats['updated'] += updated
+        return
+    except Exception as e:
+        log.error(f"Batch insert of {len(batch)} rows failed, retrying row by row: {e}")
+
+    # A failed multi-row statement is rolled back as a whole, so replay it per row
+    # to keep the good rows and isolate the bad ones.
+    for params in batch:
+        try:
+            affected = cursor.execute(INSERT_BIDS_QUERY, params)
+            inserted, updated = split_upsert_count(1, affected)
+            stats['inserted'] += inserted
+            stats['updated'] += updated
+        except Exception as e:
+            stats['failed'] += 1
+            stats['failed_ids'].append(params[0])
+            log.error(f"Error inserting data for auction {params[0]}: {e}")
+
+
+def save_bids_records(records, batch_size=SAVE_BATCH_SIZE):
+    """
+    Upserts an iterable of BidRecord-ordered tuples in batches, consuming it lazily.
+    Returns inserted/updated/failed counts, the auction IDs seen and those that failed.
+    """
+    stats = {'inserted': 0, 'updated': 0, 'failed': 0, 'auction_ids': [], 'failed_ids': []}
+    created_at = datetime.now()
+    # Includes producing the records when they are read lazily from a spreadsheet
+    with stage_timer.time(stage='save_bids_records'), MySQLConnection() as cursor:
+        batch = []
+        for record in records:
+            batch.append((*record, created_at))
+            stats['auction_ids'].append(record[0])
+            if len(batch) >= batch_size:
+                upsert_bids_batch(cursor, batch, stats)
+                batch = []
+        if batch:
+            upsert_bids_batch(cursor, batch, stats)
+        bump_data_version(cursor)
+    for result in ('inserted', 'updated', 'failed'):
+        saved_rows.inc(stats[result], result=result)
+    log.info(f"Data saving complete. Inserted {stats['inserted']}, updated {stats['updated']}, failed {stats['failed']}.")
+    return stats
+
+
+def save_bids_data(df, batch_size=SAVE_BATCH_SIZE):
     log.info(f"Saving data to the database. Total entries {len(df)}")
+    records = (
+        (
+            row['id'], row['bid'], row['bid_open_date'], row['bid_closing_date'], 
+            row.get('debt'), row['address'], row['crawl_date'], row['city'], 
+            row['state'], row['county'], row['remark']
+        )
+        for row in df.to_dict('records')
+    )
+    return save_bids_records(records, batch_size)
+
+
+FINGERPRINT_TABLE_QUERY = """
+    CREATE TABLE IF NOT EXISTS auction_fingerprints (
+        auction_id BIGINT PRIMARY KEY,
+        source VARCHAR(255) NOT NULL,
+        fingerprint CHAR(40) NOT NULL,
+        last_seen DATETIME NOT NULL,
+        KEY idx_source (source)
+    )
+"""
+UPSERT_FINGERPRINT_QUERY = """
+    INSERT INTO auction_fingerprints (auction_id, source, fingerprint, last_seen)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        source = VALUES(source),
+        fingerprint = VALUES(fingerprint),
+        last_seen = VALUES(last_seen)
+"""
+# Index of crawl_date in a BidRecord-ordered tuple
+CRAWL_DATE_FIELD = 6
+
+
+def ensure_fingerprint_table():
+    # Once per run, like setup.ensure_data_version_table, rather than on every sync
     with MySQLConnection() as cursor:
-        insert_query = """
-            INSERT INTO auction_data (
-                auction_id, bid, bid_open_date, bid_closing_date, debt, address, 
-                crawl_date, city, state, county, remark, created_at
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            ON DUPLICATE KEY UPDATE
-                bid = VALUES(bid),
-                bid_open_date = VALUES(bid_open_date),
-                bid_closing_date = VALUES(bid_closing_date),
-                debt = VALUES(debt),
-                address = VALUES(address),
-                crawl_date = VALUES(crawl_date),
-                city = VALUES(city),
-                state = VALUES(state),
-                county = VALUES(county),
-                remark = VALUES(remark),
-                created_at = COALESCE(created_at, VALUES(created_at));  -- Keep the old value if exists, otherwise use the new value
-        """
-
-        for _, row in df.iterrows():
+        cursor.execute(FINGERPRINT_TABLE_QUERY)
+
+
+def record_fingerprint(record):
+    # crawl_date changes on every run, so it isn't part of the auction's content
+    content = tuple(value for i, value in enumerate(record) if i != CRAWL_DATE_FIELD)
+    return hashlib.sha1(repr(content).encode()).hexdigest()
+
+
+def in_batches(values, batch_size):
+    values = list(values)
+    for start in range(0, len(values), batch_size):
+        yield values[start:start + batch_size]
+
+
+def sync_bids_records(records, source, batch_size=SAVE_BATCH_SIZE):
+    """
+    Incremental version of save_bids_records for one source URL. Each auction's content
+    fingerprint is stored in auction_fingerprints; only new or changed rows are upserted,
+    unchanged ones just get their crawl_date refreshed so they stay on the dashboard.
+    Returns the save_bids_records stats plus a 'delta' summary.
+    """
+    with MySQLConnection() as cursor:
+        cursor.execute("SELECT auction_id, fingerprint FROM auction_fingerprints WHERE source = %s", (source,))
+        known = dict(cursor.fetchall())
+
+    delta = {'new': [], 'changed': [], 'unchanged': [], 'removed': []}
+    fingerprints = {}
+
+    def changed_records():
+        for record in records:
             try:
-                cursor.execute(insert_query, (
-                    row['id'], row['bid'], row['bid_open_date'], row['bid_closing_date'], 
-                    row.get('debt'), row['address'], row['crawl_date'], row['city'], 
-                    row['state'], row['county'], row['remark'], datetime.now()
-                ))
-            except Exception as e:
-                log.error(f"Error inserting data: {e}")
-    log.info("Data saving complete.")
+                # openpyxl can hand back the ID as a str or float; auction_fingerprints has BIGINTs
+                auction_id = int(record[0])
+            except (TypeError, ValueError):
+                auction_id = record[0]
+            record = (auction_id, *record[1:])
+            fingerprint = record_fingerprint(record)
+            previous = known.get(auction_id)
+            if previous == fingerprint:
+                delta['unchanged'].append(auction_id)
+                continue
+            delta['new' if previous is None else 'changed'].append(auction_id)
+            fingerprints[auction_id] = fingerprint
+            yield record
 
-if __name__ == "__main__":
-    for url in urls:
+    stats = save_bids_records(changed_records(), batch_size)
+    for auction_id in stats['failed_ids']:
+        # Leave these without a fingerprint so the next run writes them again
+        fingerprints.pop(auction_id, None)
+    seen = set(delta['new']) | set(delta['changed']) | set(delta['unchanged'])
+    delta['removed'] = [auction_id for auction_id in known if auction_id not in seen]
+
+    now = datetime.now()
+    with MySQLConnection() as cursor:
+        for batch in in_batches(delta['unchanged'], batch_size):
+            cursor.execute(
+                f"UPDATE auction_data SET crawl_date = %s WHERE auction_id IN ({', '.join(['%s'] * len(batch))})",
+                [now.strftime('%Y-%m-%d %H:%M:%S'), *batch]
+            )
+        if delta['unchanged']:
+            # save_bids_records bumped the version before these crawl_dates moved, so the
+            # API could have cached pages without them
+            bump_data_version(cursor)
+        for batch in in_batches(fingerprints.items(), batch_size):
+            cursor.executemany(UPSERT_FINGERPRINT_QUERY, [(auction_id, source, fingerprint, now) for auction_id, fingerprint in batch])
+        for batch in in_batches(delta['removed'], batch_size):
+            cursor.execute(
+                f"DELETE FROM auction_fingerprints WHERE auction_id IN ({', '.join(['%s'] * len(batch))})", batch
+            )
+
+    stats['auction_ids'] = list(seen)
+    stats['delta'] = delta
+    for change, auction_ids in delta.items():
+        delta_rows.inc(len(auction_ids), change=change)
+    log.info(
+        f"Delta for {source}: {len(delta['new'])} new, {len(delta['changed'])} changed, "
+        f"{len(delta['removed'])} removed, {len(delta['unchanged'])} unchanged"
+    )
+    return stats
+
+
+# Counties scraped at the same time. Each worker has its own BidsSession (and
+# browser, if the Selenium fallback is needed).
+SCRAPE_WORKERS = 3
+
+
+def process_county(county, sessions, crawler, timings, deltas):
+    """
+    Download, parse and sync one registry county (see counties.json), then queue
+    zestimate lookups for its rows. Returns the county's auction IDs and the queued
+    lookup futures.
+    """
+    url = county.url
+    started = time.monotonic()
+    if county.strategy == 'listing':
+        records = list(iter_listing(county))
+        timings['download'] = time.monotonic() - started
+    else:
+        session = sessions.get()
         try:
-            df = scrape_bids_data(url)
-            if not df.empty:
-                save_bids_data(df)
-        except Exception as e:
-            log.error(f"An error occurred while processing {url}: {e}")
-    zillow_crawler()
-    delete_files(DOWNLOAD_PATH, '.xlsx')  # delete files after all urls have been processed
\ No newline at end of file
+            source = download_property_list(url, session)
+            timings['download'] = time.monotonic() - started
+        finally:
+            sessions.put(session)
+        if source is None:
+            log.warning(f"No property list downloaded from {url}")
+            return [], {}
+        # Parsing and saving are interleaved: rows are upserted batch by batch as they're read
+        records = iter_property_list(source, county)
+
+    started = time.monotonic()
+    stats = sync_bids_records(records, url)
+    timings['parse_and_save'] = time.monotonic() - started
+    auction_ids = stats['auction_ids']
+    deltas[url] = {change: len(ids) for change, ids in stats['delta'].items()}
+
+    # The crawler's workers take whichever job is queued next, so these futures don't
+    # track this county's lookups; zestimate time is reported once per run
+    futures = crawler.submit(fetch_crawlable_data(auction_ids))
+    return auction_ids, futures
+
+
+def run_pipeline(counties, scrape_workers=SCRAPE_WORKERS, zillow_workers=ZILLOW_MAX_WORKERS):
+    """
+    Scrapes counties in parallel and starts zestimate lookups for each county as soon
+    as its rows are saved. Returns per-county (by URL) stage timings in seconds, the
+    seconds spent finishing zestimate lookups after the last county was saved, the
+    new/changed/removed/unchanged row counts and proxy usage.
+    """
+    run_started = time.monotonic()
+    ensure_data_version_table()
+    ensure_fingerprint_table()
+    timings = {county.url: {} for county in counties}
+    deltas = {}
+    sessions = queue.Queue()
+    for _ in range(min(scrape_workers, len(counties))):
+        sessions.put(BidsSession())
+
+    zestimate_futures = {}
+    with ZillowCrawler(zillow_workers) as crawler:
+        with ThreadPoolExecutor(max_workers=scrape_workers) as executor:
+            county_futures = {
+                executor.submit(process_county, county, sessions, crawler, timings[county.url], deltas): county.url
+                for county in counties
+            }
+            for future in as_completed(county_futures):
+                url = county_futures[future]
+                try:
+                    _, futures = future.result()
+                    zestimate_futures.update(futures)
+                except Exception as e:
+                    log.error(f"An error occurred while processing {url}: {e}")
+
+        while not sessions.empty():
+            sessions.get().stop()
+
+        zestimate_started = time.monotonic()
+        # Rows that no county queued this run, e.g. from a county that failed now but
+        # saved rows in an earlier run, and jobs left over from an interrupted run
+        crawler.enqueue_new_rows()
+        crawler.wait(zestimate_futures)
+        crawler.drain()
+        zestimate_seconds = time.monotonic() - zestimate_started
+        queue_stats = crawler.queue.stats()
+
+    for url, stages in timings.items():
+        stage_text = ', '.join(f"{stage} {seconds:.1f}s" for stage, seconds in stages.items())
+        log.info(f"{url}: {stage_text or 'failed'}")
+    proxy_stats = proxy_client.stats()
+    log.info(f"Zestimate lookups finished {zestimate_seconds:.1f}s after the last county was saved")
+    log.info(f"Proxy usage: {proxy_stats['requests']} requests, {proxy_stats['credits']} credits, statuses {proxy_stats['statuses']}")
+    duration = time.monotonic() - run_started
+    log.info(f"Pipeline finished in {duration:.1f}s")
+    return {'duration': duration, 'timings': timings, 'zestimate_seconds': zestimate_seconds, 'deltas': deltas, 'proxy': proxy_stats, 'zestimate_queue': queue_stats}
+
+
+def write_run_report(result, path=RUN_REPORT_PATH):
+    """Saves run_pipeline's result plus every metric recorded during the run as JSON."""
+    report = dict(result, finished_at=datetime.now().isoformat(timespec='seconds'), metrics=metrics.snapshot())
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as file:
+        json.dump(report, file, indent=2, default=str)
+    os.replace(temp_path, path)
+    log.info(f"Run report written to {path}")
+    return report
+
+
+if __name__ == "__main__":
+    write_run_report(run_pipeline(enabled_counties()))
+    delete_files(DOWNLOAD_PATH, '.xlsx', recursive=True)  # delete files after all counties have been processed
\ No newline at end of file
@@ -0,0 +1,140 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# JSON report written by main.py at the end of every pipeline run.
+RUN_REPORT_PATH = 'run_report.json'
+# Upper bounds (seconds) of the timing histogram buckets; +Inf is implicit.
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def label_key(labels):
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def format_labels(key):
+    if not key:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in key)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(key, escaped)) + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, lock, name, description):
+        self.lock = lock
+        self.name = name
+        self.description = description
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = label_key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        return [(self.name, key, value) for key, value in self.values.items()]
+
+    def snapshot(self):
+        return {format_labels(key): value for key, value in self.values.items()}
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[label_key(labels)] = value
+
+
+class Timer:
+    """Histogram of durations in seconds, usable as a context manager or decorator."""
+    kind = 'histogram'
+
+    def __init__(self, lock, name, description, buckets=DEFAULT_BUCKETS):
+        self.lock = lock
+        self.name = name
+        self.description = description
+        self.buckets = buckets
+        self.values = {}  # label key -> [per-bucket counts..., count, sum]
+
+    def observe(self, seconds, **labels):
+        key = label_key(labels)
+        with self.lock:
+            value = self.values.setdefault(key, [0] * len(self.buckets) + [0, 0.0])
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    value[i] += 1
+            value[-2] += 1
+            value[-1] += seconds
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(time.monotonic() - started, **labels)
+
+    def samples(self):
+        samples = []
+        for key, value in self.values.items():
+            for bound, count in zip(self.buckets, value):
+                samples.append((f'{self.name}_bucket', key + (('le', str(bound)),), count))
+            samples.append((f'{self.name}_bucket', key + (('le', '+Inf'),), value[-2]))
+            samples.append((f'{self.name}_count', key, value[-2]))
+            samples.append((f'{self.name}_sum', key, value[-1]))
+        return samples
+
+    def snapshot(self):
+        return {
+            format_labels(key): {'count': value[-2], 'seconds': round(value[-1], 6)}
+            for key, value in self.values.items()
+        }
+
+
+class MetricsRegistry:
+    """
+    In-process counters, gauges and timers. render() produces the Prometheus text
+    format for the API's /metrics endpoint, snapshot() a JSON-friendly summary for
+    the pipeline's run report.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def _register(self, cls, name, description, *args):
+        with self.lock:
+            if name not in self.metrics:
+                self.metrics[name] = cls(self.lock, name, description, *args)
+            return self.metrics[name]
+
+    def counter(self, name, description):
+        return self._register(Counter, name, description)
+
+    def gauge(self, name, description):
+        return self._register(Gauge, name, description)
+
+    def timer(self, name, description, buckets=DEFAULT_BUCKETS):
+        return self._register(Timer, name, description, buckets)
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for metric in self.metrics.values():
+                lines.append(f'# HELP {metric.name} {metric.description}')
+                lines.append(f'# TYPE {metric.name} {metric.kind}')
+                for name, key, value in metric.samples():
+                    lines.append(f'{name}{format_labels(key)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def snapshot(self):
+        with self.lock:
+            return {name: metric.snapshot() for name, metric in self.metrics.items() if metric.values}
+
+
+metrics = MetricsRegistry()
+# Shared by the scrapers: time spent in each pipeline stage, labelled by stage name
+stage_timer = metrics.timer('pipeline_stage_seconds', 'Time spent in each scrape pipeline stage')
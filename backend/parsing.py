@@ -0,0 +1,47 @@
+import re
+
+import numpy as np
+import pandas as pd
+
+from setup import MONETARY_PATTERN
+
+# City and state at the end of an address: "..., West Chester PA 19380". Addresses are
+# nearly all distinct, so they're parsed row by row (bids_scraper.extract_city_state):
+# neither factorize nor Series.str.extract beat that on real lists.
+CITY_STATE_PATTERN = re.compile(r'([^,]+),?\s+([A-Za-z\s]+)\s+([A-Z]{2})\s+\d{5}$')
+
+
+def factorize(values):
+    """
+    Distinct values and, per row, the index of its value (-1 for nulls). Bid amounts
+    and debts repeat a lot in a county's list, so clean_monetary_series parses each
+    distinct string once and the results are spread back with a numpy take.
+    """
+    values = pd.Series(values, dtype=object)
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    return values, codes, uniques
+
+
+def expand(parsed, codes, dtype=object):
+    # Index -1 (null input) picks the NaN appended at the end
+    return np.append(np.asarray(parsed, dtype=dtype), np.nan)[codes]
+
+
+def parse_amount(text):
+    try:
+        return float(MONETARY_PATTERN.search(text).group(1).replace(',', ''))
+    except (AttributeError, TypeError, ValueError):
+        # No match, not a string, or only commas/dots after the $
+        return np.nan
+
+
+def clean_monetary_series(values):
+    """
+    Column-wise setup.clean_monetary_string. Returns a float64 Series (NaN where no
+    amount was found) and a mask of the non-null inputs that could not be parsed.
+    """
+    values, codes, uniques = factorize(values)
+    parsed = [parse_amount(text) for text in uniques]
+    result = pd.Series(expand(parsed, codes, 'float64'), index=values.index)
+    return result, result.isna() & values.notna()
+
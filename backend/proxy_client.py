@@ -0,0 +1,157 @@
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+log = logging.getLogger("root")
+
+PROXY_URL = 'https://proxy.scrapeops.io/v1/'
+# (connect, read) timeouts in seconds; the proxy may take a while to fetch the target
+PROXY_TIMEOUT = (10, 120)
+PROXY_POOL_SIZE = 32
+# Attempts per request, with exponential backoff and full jitter between them
+PROXY_MAX_ATTEMPTS = 4
+PROXY_BACKOFF_BASE = 2
+PROXY_BACKOFF_MAX = 60
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504, 520, 521, 522, 524}
+# After this many consecutive failures requests fail fast for PROXY_BREAKER_COOLDOWN seconds
+PROXY_BREAKER_THRESHOLD = 8
+PROXY_BREAKER_COOLDOWN = 120
+# Per-run budget. ScrapeOps charges more credits for JS rendering; every attempt is
+# counted, so this is an upper bound on what was actually billed.
+PROXY_MAX_REQUESTS = 5000
+PROXY_MAX_CREDITS = 10000
+CREDITS_PER_REQUEST = 1
+CREDITS_PER_RENDERED_REQUEST = 10
+# Max requests per second sent to any single target host through the proxy.
+PROXY_RATE_LIMIT_PER_HOST = 5
+LATENCY_BUCKETS = (0.5, 1, 2, 5, 10, 30, 60, 120)
+
+
+class BudgetExceeded(Exception):
+    pass
+
+
+class CircuitOpen(Exception):
+    pass
+
+
+class RateLimiter:
+    """Spaces out calls per key (e.g. host) so that at most `rate` happen per second."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.lock = threading.Lock()
+        self.next_slot = {}
+
+    def wait(self, key):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(key, now))
+            self.next_slot[key] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class ProxyClient:
+    """
+    Thread-safe client for the scraping proxy: pooled keep-alive session, explicit
+    timeouts, retries with exponential backoff and jitter, a circuit breaker, a per-run
+    request/credit budget and per-status / latency statistics.
+    """
+
+    def __init__(self, api_key, proxy_url=PROXY_URL, max_requests=PROXY_MAX_REQUESTS,
+                 max_credits=PROXY_MAX_CREDITS, rate_limit=PROXY_RATE_LIMIT_PER_HOST):
+        self.api_key = api_key
+        self.proxy_url = proxy_url
+        self.max_requests = max_requests
+        self.max_credits = max_credits
+        self.rate_limiter = RateLimiter(rate_limit)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=PROXY_POOL_SIZE, pool_maxsize=PROXY_POOL_SIZE)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.credits = 0
+        self.statuses = Counter()
+        self.latency_counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.latency_total = 0.0
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+
+    def _reserve(self, render_js):
+        cost = CREDITS_PER_RENDERED_REQUEST if render_js else CREDITS_PER_REQUEST
+        with self.lock:
+            if time.monotonic() < self.open_until:
+                raise CircuitOpen(f"Proxy circuit open after {self.consecutive_failures} consecutive failures")
+            if self.requests + 1 > self.max_requests or self.credits + cost > self.max_credits:
+                raise BudgetExceeded(
+                    f"Proxy budget used up ({self.requests}/{self.max_requests} requests, "
+                    f"{self.credits}/{self.max_credits} credits)"
+                )
+            self.requests += 1
+            self.credits += cost
+
+    def _record(self, status, latency, failed):
+        with self.lock:
+            self.statuses[status] += 1
+            if latency is not None:
+                bucket = next((i for i, bound in enumerate(LATENCY_BUCKETS) if latency <= bound), len(LATENCY_BUCKETS))
+                self.latency_counts[bucket] += 1
+                self.latency_total += latency
+            if not failed:
+                self.consecutive_failures = 0
+                return
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= PROXY_BREAKER_THRESHOLD:
+                self.open_until = time.monotonic() + PROXY_BREAKER_COOLDOWN
+                log.error(f"Proxy circuit opened for {PROXY_BREAKER_COOLDOWN}s after {self.consecutive_failures} failures")
+
+    def get(self, url, render_js=False):
+        params = {
+            'api_key': self.api_key,
+            'url': url,
+            # 'residential': 'true',
+            'country': 'us',
+            'render_js': render_js,
+        }
+        host = urlparse(url).netloc
+        for attempt in range(1, PROXY_MAX_ATTEMPTS + 1):
+            self._reserve(render_js)
+            self.rate_limiter.wait(host)
+            started = time.monotonic()
+            try:
+                response = self.session.get(self.proxy_url, params=params, timeout=PROXY_TIMEOUT)
+            except requests.RequestException as e:
+                self._record(type(e).__name__, None, failed=True)
+                if attempt == PROXY_MAX_ATTEMPTS:
+                    raise
+                log.warning(f"Proxy request for {url} failed on attempt {attempt}: {e}")
+            else:
+                failed = response.status_code in RETRYABLE_STATUSES
+                self._record(response.status_code, time.monotonic() - started, failed)
+                if not failed or attempt == PROXY_MAX_ATTEMPTS:
+                    return response
+                log.warning(f"Proxy returned {response.status_code} for {url} on attempt {attempt}")
+            time.sleep(random.uniform(0, min(PROXY_BACKOFF_MAX, PROXY_BACKOFF_BASE ** attempt)))
+
+    def stats(self):
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'max_requests': self.max_requests,
+                'credits': self.credits,
+                'max_credits': self.max_credits,
+                'statuses': {str(status): count for status, count in self.statuses.items()},
+                'latency_buckets': dict(zip([str(bound) for bound in LATENCY_BUCKETS] + ['+Inf'], self.latency_counts)),
+                'latency_total': self.latency_total,
+                'circuit_open': time.monotonic() < self.open_until,
+            }
@@ -0,0 +1,332 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pymysql
+from openpyxl import Workbook
+
+import setup
+from bids_scraper import AUCTION_DETAIL_URL
+from counties import enabled_counties
+from credentials import SCRAPEOPS
+from proxy_client import ProxyClient
+from setup import ConnectionPool, log, mysql_config
+from zillow_scraper import zillow_url
+
+REPLAY_FIXTURES_PATH = 'replay_fixtures'
+FIXTURE_MANIFEST = 'manifest.json'
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schema.sql')
+# Port used by `python replay.py serve`; replay_environment picks a free one.
+REPLAY_PROXY_PORT = 8765
+# Offline there are no credits to protect, so the fixture proxy gets a practically unlimited budget.
+REPLAY_PROXY_BUDGET = 10 ** 9
+
+STREETS = ['Main St', 'Market St', 'High St', 'Church St', 'Walnut St', 'Oak Ave', 'Ridge Pike', 'Penn Ave']
+CITIES = ['West Chester', 'Norristown', 'Reading', 'Philadelphia', 'Phoenixville', 'Pottstown', 'Coatesville']
+# Markup added to every generated Zillow page; real ones are much larger and
+# extract_zestimate's cost grows with page size.
+ZILLOW_PAGE_FILLER = '<div class="home-details"><p>Lorem ipsum dolor sit amet</p></div>' * 700
+
+
+class FixtureStore:
+    """
+    Recorded responses on disk. manifest.json maps each target URL to a page file and
+    its HTTP status, and each county URL to its property list spreadsheet.
+    """
+
+    def __init__(self, path=REPLAY_FIXTURES_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        manifest_path = os.path.join(path, FIXTURE_MANIFEST)
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as file:
+                self.manifest = json.load(file)
+        else:
+            self.manifest = {'pages': {}, 'property_lists': {}}
+
+    def page(self, url):
+        """(status, body) recorded for url, or None."""
+        entry = self.manifest['pages'].get(url)
+        if entry is None:
+            return None
+        with open(os.path.join(self.path, entry['file']), 'rb') as file:
+            return entry['status'], file.read()
+
+    def add_page(self, url, body, status=200):
+        name = os.path.join('pages', hashlib.sha1(url.encode()).hexdigest() + '.html')
+        os.makedirs(os.path.join(self.path, 'pages'), exist_ok=True)
+        with open(os.path.join(self.path, name), 'wb') as file:
+            file.write(body.encode() if isinstance(body, str) else body)
+        with self.lock:
+            self.manifest['pages'][url] = {'file': name, 'status': status}
+
+    def property_list(self, county_url):
+        name = self.manifest['property_lists'].get(county_url)
+        return os.path.join(self.path, name) if name else None
+
+    def add_property_list(self, county_url, workbook):
+        name = os.path.join('property_lists', urlparse(county_url).path.strip('/') + '.xlsx')
+        os.makedirs(os.path.join(self.path, 'property_lists'), exist_ok=True)
+        workbook.save(os.path.join(self.path, name))
+        with self.lock:
+            self.manifest['property_lists'][county_url] = name
+
+    def save(self):
+        os.makedirs(self.path, exist_ok=True)
+        with self.lock:
+            with open(os.path.join(self.path, FIXTURE_MANIFEST), 'w') as file:
+                json.dump(self.manifest, file, indent=2)
+
+
+class FixtureProxyHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = parse_qs(urlparse(self.path).query).get('url', [None])[0]
+        status, body = self.server.respond(url)
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # A line per request would drown out the scrapers' own logs
+        pass
+
+
+class FixtureProxy(ThreadingHTTPServer):
+    """
+    Stand-in for the ScrapeOps endpoint: answers GET ?url=... with the page recorded
+    for that URL (404 if there is none) after `latency` seconds. With record=True,
+    missing pages are fetched through the real proxy and added to the store.
+    """
+    daemon_threads = True
+
+    def __init__(self, store, port=0, latency=0.0, record=False):
+        super().__init__(('127.0.0.1', port), FixtureProxyHandler)
+        self.store = store
+        self.latency = latency
+        self.upstream = ProxyClient(SCRAPEOPS) if record else None
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'recorded': 0}
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}/'
+
+    def count(self, stat):
+        with self.lock:
+            self.stats[stat] += 1
+
+    def respond(self, url):
+        if self.latency:
+            time.sleep(self.latency)
+        fixture = self.store.page(url) if url else None
+        if fixture is None and url and self.upstream is not None:
+            response = self.upstream.get(url)
+            self.store.add_page(url, response.content, response.status_code)
+            self.store.save()
+            self.count('recorded')
+            return response.status_code, response.content
+        if fixture is None:
+            self.count('misses')
+            return 404, f'No fixture for {url}'.encode()
+        self.count('hits')
+        return fixture
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+        self.thread.join()
+        self.server_close()
+
+
+def read_schema(path=SCHEMA_PATH):
+    with open(path) as file:
+        text = ''.join(line for line in file if not line.lstrip().startswith('--'))
+    return [statement.strip() for statement in text.split(';') if statement.strip()]
+
+
+def server_connection():
+    config = mysql_config()
+    return pymysql.connect(host=config['host'], user=config['user'], password=config['password'], port=config['port'])
+
+
+def create_database(name, schema_path=SCHEMA_PATH):
+    """Creates database `name` on the configured MySQL server and loads schema.sql into it."""
+    connection = server_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"CREATE DATABASE `{name}` CHARACTER SET utf8mb4")
+            cursor.execute(f"USE `{name}`")
+            for statement in read_schema(schema_path):
+                cursor.execute(statement)
+        connection.commit()
+    finally:
+        connection.close()
+    log.info(f"Created replay database {name}")
+
+
+def drop_database(name):
+    connection = server_connection()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP DATABASE IF EXISTS `{name}`")
+    finally:
+        connection.close()
+    log.info(f"Dropped replay database {name}")
+
+
+@contextmanager
+def replay_environment(store, latency=0.0, rate_limit=None, keep_database=False):
+    """
+    For the duration of the block, proxied_request goes to a FixtureProxy serving `store`
+    and MySQLConnection / the API's async pool use a throwaway database built from
+    schema.sql on the configured server. Yields (proxy, database name).
+    """
+    name = f"bids_replay_{os.getpid()}_{int(time.time())}"
+    create_database(name)
+    saved_client, saved_pool = setup.proxy_client, setup.mysql_pool
+    saved_database = os.environ.get('MYSQL_DATABASE')
+    try:
+        with FixtureProxy(store, latency=latency) as proxy:
+            os.environ['MYSQL_DATABASE'] = name
+            setup.mysql_pool = ConnectionPool(mysql_config())
+            setup.proxy_client = ProxyClient(
+                'replay', proxy_url=proxy.url, max_requests=REPLAY_PROXY_BUDGET,
+                max_credits=REPLAY_PROXY_BUDGET, rate_limit=rate_limit,
+            )
+            try:
+                yield proxy, name
+            finally:
+                setup.mysql_pool.close()
+    finally:
+        setup.proxy_client, setup.mysql_pool = saved_client, saved_pool
+        if saved_database is None:
+            os.environ.pop('MYSQL_DATABASE', None)
+        else:
+            os.environ['MYSQL_DATABASE'] = saved_database
+        if keep_database:
+            log.info(f"Kept replay database {name}")
+        else:
+            drop_database(name)
+
+
+def synthetic_address():
+    return (f"{random.randint(1, 9999)} {random.choice(STREETS)}, "
+            f"{random.choice(CITIES)} PA {random.randint(19000, 19600)}")
+
+
+def zillow_page(zestimate):
+    kind = random.random()
+    if kind < 0.7:
+        body = f'<div class="summary"><span data-testid="price">${zestimate:,}</span></div>'
+    elif kind < 0.9:
+        # Only in the embedded page data: extract_zestimate_fast's JSON fallback
+        body = f'<script type="application/json">{{"property":{{"zestimate":{zestimate},"beds":3}}}}</script>'
+    else:
+        # Neither: extract_zestimate_soup has to find it next to the "Zestimate" label
+        body = f'<div class="estimate"><span>Zestimate</span><span>${zestimate:,}</span></div>'
+    return f'<html><head><title>Zillow</title></head><body>{ZILLOW_PAGE_FILLER}{body}</body></html>'
+
+
+def detail_page(debt, county):
+    return (
+        '<html><body><div class="item-specifics-table">'
+        '<table class="pull-left"><tr><td>Auction ID</td><td></td></tr></table>'
+        '<table class="pull-right">'
+        f'<tr><td>Debt Amount</td><td>${debt:,.2f}</td></tr>'
+        f'<tr><td>County</td><td>{county}</td></tr>'
+        '</table></div></body></html>'
+    )
+
+
+def header_copy(header):
+    match = re.search(r'\.(\d+)$', header)
+    return int(match.group(1)) if match else 0
+
+
+def property_list_workbook(county, first_id, rows):
+    """
+    A spreadsheet laid out like `county`'s download (title rows, then its header row and
+    columns). Returns the workbook and the generated values of each row.
+    """
+    # Repeated headers appear as "Name.1" in the column map (bids_scraper.dedupe_headers),
+    # so the unnumbered copy has to come first in the sheet
+    headers = sorted(county.columns, key=header_copy)
+    date_format = county.date_formats[0]
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([f"{county.county} County Sheriff Sale"])
+    for _ in range(county.header_row - 2):
+        sheet.append([f"Generated {datetime.now():%m/%d/%Y}"])
+    sheet.append([re.sub(r'\.\d+$', '', header) for header in headers] + ['Parcel Number'])
+    opens = datetime.now().replace(minute=0, second=0, microsecond=0) + timedelta(days=7)
+    generated = []
+    for auction_id in range(first_id, first_id + rows):
+        open_date = opens + timedelta(hours=random.randint(0, 2000))
+        values = {
+            'id': auction_id,
+            'bid': round(random.uniform(1000, 100000), 2),
+            'bid_open_date': open_date.strftime(date_format),
+            'bid_closing_date': (open_date + timedelta(days=7)).strftime(date_format),
+            'debt': round(random.uniform(5000, 400000), 2) if random.random() > 0.1 else None,
+            'address': synthetic_address(),
+        }
+        parcel = f"{random.randint(10, 99)}-{random.randint(100, 999)}"
+        sheet.append([values[county.columns[header]] for header in headers] + [parcel])
+        generated.append(values)
+    return workbook, generated
+
+
+def generate_fixtures(store, counties, rows_per_county, seed=0):
+    """
+    Fills `store` with synthetic fixtures shaped like the real ones: a property list per
+    county and, for every auction in them, a Zillow page and an auction detail page.
+    Lets the harness run before anything has been recorded.
+    """
+    random.seed(seed)
+    for index, county in enumerate(counties):
+        workbook, generated = property_list_workbook(county, index * rows_per_county + 1, rows_per_county)
+        store.add_property_list(county.url, workbook)
+        for values in generated:
+            store.add_page(zillow_url(values['address']), zillow_page(random.randint(50, 900) * 1000))
+            store.add_page(AUCTION_DETAIL_URL.format(values['id']), detail_page(values['debt'] or 0, county.county))
+    store.save()
+    log.info(f"Generated fixtures for {len(counties)} counties, {rows_per_county} rows each, in {store.path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay fixtures: generate synthetic ones or serve them as a fake proxy.")
+    parser.add_argument('command', choices=['generate', 'serve'])
+    parser.add_argument('--fixtures', default=REPLAY_FIXTURES_PATH)
+    parser.add_argument('--rows', type=int, default=1000, help="rows per county (generate)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--port', type=int, default=REPLAY_PROXY_PORT)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every response (serve)")
+    parser.add_argument('--record', action='store_true', help="fetch and save missing pages through ScrapeOps (serve)")
+    args = parser.parse_args()
+
+    store = FixtureStore(args.fixtures)
+    if args.command == 'generate':
+        generate_fixtures(store, [county for county in enabled_counties() if county.strategy == 'property_list'], args.rows, args.seed)
+    else:
+        with FixtureProxy(store, port=args.port, latency=args.latency, record=args.record) as proxy:
+            log.info(f"Serving {len(store.manifest['pages'])} pages from {store.path}; run the scrapers with PROXY_URL={proxy.url}")
+            try:
+                proxy.thread.join()
+            except KeyboardInterrupt:
+                pass
+            log.info(f"Fixture proxy stats: {proxy.stats}")
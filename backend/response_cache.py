@@ -0,0 +1,85 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from pymysql.err import MySQLError
+
+from async_db import AsyncMySQLConnection
+from setup import log
+
+RESPONSE_CACHE_MAX_ENTRIES = 512
+# Cached responses also expire after this many seconds, because the API's
+# 20-hour crawl_date window keeps moving even when the data doesn't change.
+RESPONSE_CACHE_TTL = 300
+# How often the API re-reads data_version from MySQL.
+VERSION_CHECK_INTERVAL = 5
+
+
+class ResponseCache:
+    """
+    LRU/TTL cache of serialized responses. Entries are stored under the data version
+    they were built from, so bumping data_version (done by the scrapers after they
+    commit) makes every older entry unreachable.
+    """
+
+    def __init__(self, max_entries=RESPONSE_CACHE_MAX_ENTRIES, ttl=RESPONSE_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.metrics = {'hits': 0, 'misses': 0, 'not_modified': 0, 'evictions': 0}
+
+    def get(self, version, key):
+        with self.lock:
+            entry = self.entries.get((version, key))
+            if entry and entry[0] > time.monotonic():
+                self.entries.move_to_end((version, key))
+                self.metrics['hits'] += 1
+                return entry[1], entry[2]
+            self.metrics['misses'] += 1
+            return None
+
+    def put(self, version, key, body):
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        with self.lock:
+            self.entries[(version, key)] = (time.monotonic() + self.ttl, etag, body)
+            self.entries.move_to_end((version, key))
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.metrics['evictions'] += 1
+        return etag, body
+
+    def record_not_modified(self):
+        with self.lock:
+            self.metrics['not_modified'] += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.metrics['hits'] + self.metrics['misses']
+            return dict(
+                self.metrics,
+                entries=len(self.entries),
+                hit_rate=self.metrics['hits'] / lookups if lookups else 0.0,
+            )
+
+
+response_cache = ResponseCache()
+
+_version = {'value': 0, 'checked_at': None}
+
+
+async def get_data_version():
+    """Current data_version, re-read from MySQL at most every VERSION_CHECK_INTERVAL seconds."""
+    now = time.monotonic()
+    if _version['checked_at'] is not None and now - _version['checked_at'] < VERSION_CHECK_INTERVAL:
+        return _version['value']
+    try:
+        async with AsyncMySQLConnection() as cursor:
+            await cursor.execute("SELECT version FROM data_version WHERE id = 1")
+            row = await cursor.fetchone()
+        _version['value'] = row[0] if row else 0
+    except MySQLError as e:
+        log.error(f"Error reading data version: {e}")
+    _version['checked_at'] = now
+    return _version['value']
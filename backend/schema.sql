@@ -0,0 +1,36 @@
+-- Tables the scrapers and the API expect. replay.py loads this into a throwaway
+-- database; data_version and auction_fingerprints are also created on demand by
+-- setup.ensure_data_version_table and main.ensure_fingerprint_table at pipeline start.
+
+CREATE TABLE auction_data (
+    auction_id BIGINT PRIMARY KEY,
+    bid DECIMAL(14, 2),
+    bid_open_date DATETIME,
+    bid_closing_date DATETIME,
+    debt DECIMAL(14, 2),
+    address VARCHAR(255),
+    crawl_date DATETIME,
+    city VARCHAR(100),
+    state VARCHAR(8),
+    county VARCHAR(100),
+    remark VARCHAR(100),
+    v_o DOUBLE,
+    zestimate DOUBLE,
+    created_at DATETIME,
+    KEY idx_crawl_date (crawl_date),
+    KEY idx_created_at (created_at),
+    FULLTEXT INDEX ft_auction_search (address, city, county, remark)
+);
+
+CREATE TABLE data_version (
+    id TINYINT PRIMARY KEY,
+    version BIGINT NOT NULL
+);
+
+CREATE TABLE auction_fingerprints (
+    auction_id BIGINT PRIMARY KEY,
+    source VARCHAR(255) NOT NULL,
+    fingerprint CHAR(40) NOT NULL,
+    last_seen DATETIME NOT NULL,
+    KEY idx_source (source)
+);
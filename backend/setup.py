@@ -1,5 +1,6 @@
 from logging import config
 import logging
+import os
 import re
 import traceback
 from selenium import webdriver
@@ -8,26 +9,33 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
+import threading
 import time
 import warnings
 import pymysql
 
 from credentials import CONFIG, DOWNLOAD_PATH, SCRAPEOPS
-import requests
+
+from metrics import metrics
+from proxy_client import PROXY_URL, BudgetExceeded, CircuitOpen, ProxyClient
+
+# Set PROXY_URL to send proxied requests somewhere else, e.g. the fixture server in replay.py
+proxy_client = ProxyClient(SCRAPEOPS, proxy_url=os.environ.get('PROXY_URL', PROXY_URL))
+proxy_request_seconds = metrics.timer('proxy_request_seconds', 'proxied_request calls, retries included, by final status')
+
 
 def proxied_request(url, render_js=False):
-        PROXY_URL = 'https://proxy.scrapeops.io/v1/'
-        API_KEY = SCRAPEOPS
-        return requests.get(
-            url=PROXY_URL,
-            params={
-                'api_key': API_KEY,
-                'url': url, 
-                # 'residential': 'true', 
-                'country': 'us',
-                'render_js': render_js
-            },
-        )
+    started = time.monotonic()
+    status = 'error'
+    try:
+        response = proxy_client.get(url, render_js=render_js)
+        status = response.status_code
+        return response
+    except Exception as e:
+        status = type(e).__name__
+        raise
+    finally:
+        proxy_request_seconds.observe(time.monotonic() - started, status=status)
 
 
 @contextmanager
@@ -55,28 +63,194 @@ def get_driver():
         driver.quit()
 
 
-class MySQLConnection:
-    def __init__(self):
-        self.config = CONFIG
+# Pooled MySQL connections shared by everything in the process (API and scrapers).
+POOL_MAX_SIZE = 10
+# Idle connections older than this many seconds are closed instead of reused.
+POOL_IDLE_TIMEOUT = 300
+# How long a checkout waits for a free slot before giving up.
+POOL_CHECKOUT_TIMEOUT = 30
 
-    def __enter__(self):
-        self.connection = pymysql.connect(
+
+class ConnectionPool:
+    """
+    Thread-safe pool of pymysql connections. Connections are pinged on checkout,
+    evicted after POOL_IDLE_TIMEOUT seconds idle, and at most max_size are open at once.
+    """
+
+    def __init__(self, config, max_size=POOL_MAX_SIZE, idle_timeout=POOL_IDLE_TIMEOUT,
+                 checkout_timeout=POOL_CHECKOUT_TIMEOUT):
+        self.config = config
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.checkout_timeout = checkout_timeout
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.idle = []  # (connection, released_at), most recently used last
+        self.metrics = {
+            'checkouts': 0,
+            'created': 0,
+            'reused': 0,
+            'closed': 0,
+            'ping_failures': 0,
+            'checkout_timeouts': 0,
+            'in_use': 0,
+        }
+
+    def _connect(self):
+        return pymysql.connect(
             host=self.config['host'],
             user=self.config['user'],
             password=self.config['password'],
             database=self.config['database'],
             port=self.config['port']
         )
+
+    def _close(self, connection):
+        self.metrics['closed'] += 1
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _evict_idle(self):
+        cutoff = time.monotonic() - self.idle_timeout
+        while self.idle and self.idle[0][1] < cutoff:
+            connection, _ = self.idle.pop(0)
+            self._close(connection)
+
+    def _take_idle(self):
+        while True:
+            with self.lock:
+                self._evict_idle()
+                if not self.idle:
+                    return None
+                connection, _ = self.idle.pop()
+            try:
+                connection.ping(reconnect=False)
+                with self.lock:
+                    self.metrics['reused'] += 1
+                return connection
+            except Exception:
+                with self.lock:
+                    self.metrics['ping_failures'] += 1
+                    self._close(connection)
+
+    def acquire(self):
+        if not self.slots.acquire(timeout=self.checkout_timeout):
+            with self.lock:
+                self.metrics['checkout_timeouts'] += 1
+            raise pymysql.err.OperationalError(f"Timed out waiting {self.checkout_timeout}s for a MySQL connection")
+        try:
+            connection = self._take_idle()
+            if connection is None:
+                connection = self._connect()
+                with self.lock:
+                    self.metrics['created'] += 1
+        except Exception:
+            self.slots.release()
+            raise
+        with self.lock:
+            self.metrics['checkouts'] += 1
+            self.metrics['in_use'] += 1
+        return connection
+
+    def release(self, connection, discard=False):
+        with self.lock:
+            self.metrics['in_use'] -= 1
+            if discard or not connection.open:
+                self._close(connection)
+            else:
+                self.idle.append((connection, time.monotonic()))
+        self.slots.release()
+
+    def close(self):
+        """Closes the idle connections; ones still checked out are closed when released."""
+        with self.lock:
+            while self.idle:
+                connection, _ = self.idle.pop()
+                self._close(connection)
+
+    def stats(self):
+        with self.lock:
+            self._evict_idle()
+            return dict(self.metrics, idle=len(self.idle), max_size=self.max_size)
+
+
+# Environment variables that override credentials.CONFIG, e.g. MYSQL_DATABASE for a
+# throwaway replay database.
+MYSQL_ENV_OVERRIDES = {
+    'host': 'MYSQL_HOST',
+    'port': 'MYSQL_PORT',
+    'user': 'MYSQL_USER',
+    'password': 'MYSQL_PASSWORD',
+    'database': 'MYSQL_DATABASE',
+}
+
+
+def mysql_config():
+    config = dict(CONFIG)
+    for key, variable in MYSQL_ENV_OVERRIDES.items():
+        if variable in os.environ:
+            config[key] = int(os.environ[variable]) if key == 'port' else os.environ[variable]
+    return config
+
+
+mysql_pool = ConnectionPool(mysql_config())
+mysql_checkout_seconds = metrics.timer('mysql_checkout_seconds', 'Time MySQLConnection waited for a pooled connection')
+mysql_transaction_seconds = metrics.timer('mysql_transaction_seconds', 'Time a MySQLConnection block held its connection, by outcome')
+
+
+class MySQLConnection:
+    def __init__(self, pool=None):
+        self.pool = pool or mysql_pool
+
+    def __enter__(self):
+        with mysql_checkout_seconds.time():
+            self.connection = self.pool.acquire()
+        self.started = time.monotonic()
         self.cursor = self.connection.cursor()
         return self.cursor
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        if exc_tb is None:
-            self.connection.commit()
-        else:
-            self.connection.rollback()
-        self.cursor.close()
-        self.connection.close()
+        discard = False
+        try:
+            if exc_tb is None:
+                self.connection.commit()
+            else:
+                self.connection.rollback()
+        except Exception:
+            discard = True
+            raise
+        finally:
+            self.cursor.close()
+            self.pool.release(self.connection, discard=discard)
+            outcome = 'error' if discard else 'commit' if exc_tb is None else 'rollback'
+            mysql_transaction_seconds.observe(time.monotonic() - self.started, outcome=outcome)
+
+
+# data_version is bumped whenever the scrapers commit new data, so the API can
+# tell when its cached responses are stale. The table is in schema.sql; entry points
+# call ensure_data_version_table() once so DDL never runs inside a write transaction
+# (it would commit it implicitly).
+DATA_VERSION_TABLE_QUERY = """
+    CREATE TABLE IF NOT EXISTS data_version (
+        id TINYINT PRIMARY KEY,
+        version BIGINT NOT NULL
+    )
+"""
+BUMP_DATA_VERSION_QUERY = """
+    INSERT INTO data_version (id, version) VALUES (1, 1)
+    ON DUPLICATE KEY UPDATE version = version + 1
+"""
+
+
+def ensure_data_version_table():
+    with MySQLConnection() as cursor:
+        cursor.execute(DATA_VERSION_TABLE_QUERY)
+
+
+def bump_data_version(cursor):
+    cursor.execute(BUMP_DATA_VERSION_QUERY)
 
 
 def retry(max_retry_count, interval_sec):
@@ -86,6 +260,9 @@ def retry(max_retry_count, interval_sec):
             while retry_count < max_retry_count:
                 try:
                     return func(*args, **kwargs)
+                except (BudgetExceeded, CircuitOpen):
+                    # Retrying can't help until the run ends or the breaker cools down
+                    raise
                 except Exception as e:
                     retry_count += 1
                     log.error(f'{func.__name__} failed on attempt {retry_count}: {str(e)}')
@@ -140,10 +317,13 @@ def configure_get_log():
 
 log = configure_get_log()
 
+# Number after the dollar sign; also used by parsing.clean_monetary_series
+MONETARY_PATTERN = re.compile(r'\$([\d,]+\.?\d*)')
+
+
 def clean_monetary_string(value_str):
     try:
-        # Updated regex pattern to correctly extract the number after the dollar sign
-        match = re.search(r'\$([\d,]+\.?\d*)', value_str)
+        match = MONETARY_PATTERN.search(value_str)
         if match:
             # Remove commas and convert to float
             cleaned_str = match.group(1).replace(',', '')
@@ -154,54 +334,3 @@ def clean_monetary_string(value_str):
         log.error(f"Error cleaning monetary string: {e}. value = {value_str}")
         return None
     
-
-def url_to_county(url):
-    return {
-        "https://www.bid4assets.com/chestercopasheriffsales": 'Chester',
-        "https://www.bid4assets.com/MontcoPASheriff": 'Montgomery',
-        "https://www.bid4assets.com/berkscountysheriffsales": "Berks",
-        "https://www.bid4assets.com/philataxsales": 'Philadelphia',
-        "https://www.bid4assets.com/philaforeclosures": 'Philadelphia'
-    }[url]
-
-def url_to_col_name(url):
-    return {
-        "https://www.bid4assets.com/chestercopasheriffsales": {'Auction ID': "id", 
-                                                       'Minimum Bid': 'bid', 
-                                                       'Bidding Open Date/Time': 'bid_open_date', 
-                                                       'Bidding Closing Date/Time': 'bid_closing_date', 
-                                                       'Debt Amount': 'debt', 
-                                                       'Address': 'address'},
-        "https://www.bid4assets.com/MontcoPASheriff": {'Auction ID': "id", 
-                                                       'Minimum Bid': 'bid', 
-                                                       'Bidding Open Date/Time': 'bid_open_date', 
-                                                       'Bidding Closing Date/Time': 'bid_closing_date', 
-                                                       'Debt Amount': 'debt', 
-                                                       'Address': 'address'},
-        "https://www.bid4assets.com/berkscountysheriffsales": {'Auction ID': "id", 
-                                                       'Minimum Bid': 'bid', 
-                                                       'Bidding Open Date/Time': 'bid_open_date', 
-                                                       'Bidding Closing Date/Time': 'bid_closing_date', 
-                                                       'Debt Amount': 'debt', 
-                                                       'Address': 'address'},
-        "https://www.bid4assets.com/philataxsales": {'Auction ID': "id", 
-                                                       'Minimum Bid': 'bid', 
-                                                       'Bidding Open Date/Time': 'bid_open_date', 
-                                                       'Bidding Close Date/Time': 'bid_closing_date', 
-                                                       'Address': 'address'},
-        "https://www.bid4assets.com/philaforeclosures": {'Auction ID': "id", 
-                                                       'Minimum Bid': 'bid', 
-                                                       'Bidding Open Date/Time.1': 'bid_open_date', 
-                                                       'Bidding Open Date/Time': 'bid_closing_date', 
-                                                       'Debt Amount': 'debt', 
-                                                       'Address': 'address'},
-    }[url]
-
-def get_remark(url):
-    return {
-        "https://www.bid4assets.com/chestercopasheriffsales": '',
-        "https://www.bid4assets.com/MontcoPASheriff": '',
-        "https://www.bid4assets.com/berkscountysheriffsales": "",
-        "https://www.bid4assets.com/philataxsales": 'Phila tax',
-        "https://www.bid4assets.com/philaforeclosures": 'Phila foreclosure'
-    }[url]
\ No newline at end of file
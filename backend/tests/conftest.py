@@ -0,0 +1,21 @@
+import os
+import sys
+import tempfile
+import types
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+try:
+    import credentials  # noqa: F401
+except ImportError:
+    # credentials.py isn't committed; the tests never reach the real services
+    scratch = tempfile.mkdtemp(prefix='bids_tests_')
+    sys.modules['credentials'] = types.SimpleNamespace(
+        CONFIG={'host': '127.0.0.1', 'user': 'test', 'password': '', 'database': 'bids_test', 'port': 3306},
+        DOWNLOAD_PATH=scratch,
+        TARGET_PATH=scratch,
+        SCRAPEOPS='test',
+        BIDS_USERNAME='test',
+        BIDS_PASSWORD='test',
+    )
@@ -0,0 +1,12 @@
+from fastapi.testclient import TestClient
+
+import api
+import async_db
+
+
+def test_api_starts_while_mysql_is_unreachable(monkeypatch):
+    monkeypatch.setattr(async_db, 'mysql_config', lambda: {
+        'host': '127.0.0.1', 'user': 'test', 'password': '', 'database': 'bids_test', 'port': 1,
+    })
+    with TestClient(api.app, raise_server_exceptions=False) as client:
+        assert client.get('/auctions').status_code == 500
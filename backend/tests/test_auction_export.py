@@ -0,0 +1,144 @@
+import anyio
+import pytest
+
+import api
+import async_db
+import auction_export
+
+EXPORT_SCOPE = {
+    'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+    'path': '/auctions/export', 'raw_path': b'/auctions/export', 'query_string': b'format=csv', 'root_path': '',
+    'headers': [], 'server': ('testserver', 80), 'client': ('testclient', 50000),
+}
+# Reading the rest of an unfinished server-side result; long enough to fail the tests' deadlines
+DRAIN_SECONDS = 30
+
+
+class FakeSSCursor:
+    def __init__(self, rows):
+        self.rows = rows
+        self.read = 0
+
+    async def execute(self, query, params=None):
+        pass
+
+    async def fetchmany(self, size):
+        await anyio.sleep(0)
+        chunk = [(i, 1, None, None, None, 'a', None, 'c', 'PA', 'x', '', None, None, None)
+                 for i in range(self.read, min(self.read + size, self.rows))]
+        self.read += len(chunk)
+        return chunk
+
+    async def close(self):
+        if self.read < self.rows:
+            await anyio.sleep(DRAIN_SECONDS)
+
+
+class FakeConnection:
+    def __init__(self, rows):
+        self.rows = rows
+        self.closed = False
+        self.committed = False
+
+    async def cursor(self, cursor_class):
+        self.cursor_ = FakeSSCursor(self.rows)
+        return self.cursor_
+
+    async def commit(self):
+        if self.cursor_.read < self.rows:
+            await anyio.sleep(DRAIN_SECONDS)
+        self.committed = True
+
+    async def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+
+class FakePool:
+    def __init__(self, rows):
+        self.rows = rows
+        self.connections = []
+        self.in_use = 0
+
+    async def acquire(self):
+        self.in_use += 1
+        self.connections.append(FakeConnection(self.rows))
+        return self.connections[-1]
+
+    def release(self, connection):
+        self.in_use -= 1
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = FakePool(rows=10 * auction_export.EXPORT_CHUNK_ROWS)
+    monkeypatch.setattr(async_db, 'async_pool', pool)
+    return pool
+
+
+async def request_export(on_send=None, disconnect_after=None):
+    """Calls the API directly over ASGI; the client disconnects after `disconnect_after` body chunks."""
+    disconnected = anyio.Event()
+    requested = False
+    bodies = []
+
+    async def receive():
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if on_send:
+            on_send(message)
+        if message['type'] == 'http.response.body':
+            bodies.append(message['body'])
+            if disconnect_after is not None and len(bodies) >= disconnect_after:
+                disconnected.set()
+
+    with anyio.fail_after(5):
+        await api.app(dict(EXPORT_SCOPE), receive, send)
+    return bodies
+
+
+def test_complete_export_returns_connection_to_pool(pool):
+    bodies = anyio.run(request_export)
+    assert b''.join(bodies).count(b'\n') == pool.rows + 1
+    assert pool.in_use == 0
+    assert pool.connections[0].committed and not pool.connections[0].closed
+
+
+def test_client_disconnect_releases_connection(pool):
+    for _ in range(25):
+        anyio.run(lambda: request_export(disconnect_after=2))
+    assert pool.in_use == 0
+    assert all(connection.closed and not connection.committed for connection in pool.connections)
+
+
+def test_response_that_never_starts_releases_connection(pool):
+    def fail(message):
+        if message['type'] == 'http.response.start':
+            raise OSError('client gone')
+
+    with pytest.raises(Exception):
+        anyio.run(lambda: request_export(on_send=fail))
+    assert pool.in_use == 0
+    assert pool.connections[0].closed
+
+
+def test_cancelled_query_still_releases_connection(pool):
+    async def query_then_cancel():
+        async with anyio.create_task_group() as group:
+            async def run_query():
+                async with async_db.AsyncMySQLConnection(auction_export.aiomysql.SSCursor) as cursor:
+                    await cursor.fetchmany(10)
+                    group.cancel_scope.cancel()
+                    await anyio.sleep(1)
+            group.start_soon(run_query)
+
+    anyio.run(query_then_cancel)
+    assert pool.in_use == 0
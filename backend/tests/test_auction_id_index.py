@@ -0,0 +1,60 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import auction_id_index
+from auction_id_index import AuctionIdIndex
+
+
+class FakeAuctionData:
+    """auction_data rows as (auction_id, created_at), filtered the way MySQL would."""
+
+    def __init__(self):
+        self.rows = []
+
+    def __call__(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=()):
+        self.result = [row for row in self.rows if not params or row[1] >= params[0]]
+
+    def fetchall(self):
+        return self.result
+
+
+@pytest.fixture
+def auction_data(monkeypatch):
+    table = FakeAuctionData()
+    monkeypatch.setattr(auction_id_index, 'MySQLConnection', table)
+    return table
+
+
+def test_refresh_picks_up_rows_committed_below_the_mark(auction_data, tmp_path):
+    path = str(tmp_path / 'auction_ids.idx')
+    started = datetime(2026, 3, 1, 12, 0, 0)
+    # A slow county save stamped at 12:00 hasn't committed yet; a quicker one at 12:05 has
+    auction_data.rows = [(2, started + timedelta(minutes=5))]
+    index = AuctionIdIndex(path).refresh()
+    assert list(index.ids) == [2]
+
+    auction_data.rows.append((1, started))
+    index = AuctionIdIndex(path).refresh()
+    assert list(index.ids) == [1, 2]
+
+
+def test_mark_round_trips_through_the_file(auction_data, tmp_path):
+    path = str(tmp_path / 'auction_ids.idx')
+    # Inside the hour the DST fall-back repeats in most timezones that observe it
+    created_at = datetime(2026, 11, 1, 1, 30, 0)
+    auction_data.rows = [(7, created_at)]
+    AuctionIdIndex(path).refresh()
+
+    index = AuctionIdIndex(path)
+    assert index.synced_until == created_at
+    assert 7 in index and len(index) == 1
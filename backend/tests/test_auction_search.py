@@ -0,0 +1,32 @@
+from auction_search import build_search
+
+
+def test_word_search_is_a_bare_fulltext_match():
+    where, params = build_search('west chester')
+    assert where == '(MATCH(address, city, county, remark) AGAINST (%s IN BOOLEAN MODE))'
+    assert params == ['+west* +chester*']
+
+
+def test_indexed_match_is_never_ored_with_other_columns():
+    where, params = build_search('19380')
+    branches = where.split(' UNION ')
+    assert len(branches) == 3
+    assert branches[0].endswith('WHERE MATCH(address, city, county, remark) AGAINST (%s IN BOOLEAN MODE)')
+    assert branches[1] == 'SELECT auction_id FROM auction_data WHERE auction_id = %s'
+    assert params == ['+19380*', 19380, 19380, 19380, 19380]
+
+
+def test_unindexed_ways_share_one_scan():
+    where, params = build_search('pa')
+    assert 'UNION' not in where and 'state = %s' in where
+    assert params[-1] == 'PA'
+
+
+def test_nothing_to_search_matches_nothing():
+    assert build_search('!!') == ('FALSE', [])
+
+
+def test_short_words_filter_what_the_index_found():
+    where, params = build_search('123 Main St')
+    assert where.startswith('(MATCH(address, city, county, remark) AGAINST (%s IN BOOLEAN MODE) AND (LOWER(address) LIKE %s')
+    assert params == ['+123* +main*'] + ['%123 main st%'] * 4
@@ -0,0 +1,93 @@
+import io
+
+import pytest
+
+import main
+from bids_scraper import iter_property_list
+from counties import enabled_counties
+from replay import property_list_workbook
+
+
+class FakeDatabase:
+    """auction_fingerprints kept in a dict; every other statement is just recorded."""
+
+    def __init__(self):
+        self.fingerprints = {}
+        self.statements = []
+
+    def __call__(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=()):
+        self.statements.append(' '.join(query.split()))
+        if query.startswith("SELECT auction_id, fingerprint"):
+            self.result = [(auction_id, fingerprint) for auction_id, (source, fingerprint) in self.fingerprints.items()
+                           if source == params[0]]
+        return 1
+
+    def executemany(self, query, rows):
+        self.statements.append(' '.join(query.split()))
+        if query == main.UPSERT_FINGERPRINT_QUERY:
+            for auction_id, source, fingerprint, _ in rows:
+                # BIGINT column: whatever was sent comes back as an int
+                self.fingerprints[int(auction_id)] = (source, fingerprint)
+        return len(rows)
+
+    def fetchall(self):
+        return self.result
+
+
+@pytest.fixture
+def database(monkeypatch):
+    database = FakeDatabase()
+    monkeypatch.setattr(main, 'MySQLConnection', database)
+    return database
+
+
+@pytest.fixture
+def sheet():
+    county = next(county for county in enabled_counties() if county.strategy == 'property_list')
+    workbook, _ = property_list_workbook(county, 1, 50)
+    data = io.BytesIO()
+    workbook.save(data)
+    return county, data.getvalue()
+
+
+def parse(sheet, id_type=None):
+    county, data = sheet
+    records = list(iter_property_list(io.BytesIO(data), county))
+    if id_type:
+        records = [record._replace(id=id_type(record.id)) for record in records]
+    return records
+
+
+@pytest.mark.parametrize('id_type', [None, str, float])
+def test_same_sheet_twice_has_no_new_or_changed_rows(database, sheet, id_type):
+    first = main.sync_bids_records(parse(sheet, id_type), 'county-url')
+    assert len(first['delta']['new']) == 50
+
+    second = main.sync_bids_records(parse(sheet, id_type), 'county-url')
+    assert second['delta']['new'] == [] and second['delta']['changed'] == []
+    assert len(second['delta']['unchanged']) == 50 and second['delta']['removed'] == []
+
+
+def test_data_version_bumped_after_crawl_dates_refresh(database, sheet):
+    main.sync_bids_records(parse(sheet), 'county-url')
+    database.statements.clear()
+    main.sync_bids_records(parse(sheet), 'county-url')
+
+    refreshed = max(i for i, statement in enumerate(database.statements)
+                    if statement.startswith("UPDATE auction_data SET crawl_date"))
+    bumped = [i for i, statement in enumerate(database.statements) if "INTO data_version" in statement]
+    assert bumped and bumped[-1] > refreshed
+
+
+def test_sync_runs_no_ddl(database, sheet):
+    main.sync_bids_records(parse(sheet), 'county-url')
+    assert not [statement for statement in database.statements if statement.upper().startswith(('CREATE', 'ALTER'))]
@@ -0,0 +1,16 @@
+import sqlite3
+import time
+
+from zestimate_cache import ZestimateCache
+
+
+def test_expired_entries_are_purged_on_exit(tmp_path):
+    path = str(tmp_path / 'cache.sqlite')
+    with ZestimateCache(path, ttl=60) as cache:
+        cache.set('1 Main St', '$250,000')
+        cache.set('2 Oak Ave', '$300,000')
+        cache.connection.execute("UPDATE zestimates SET fetched_at = ? WHERE address_key = '1 main st'", (time.time() - 120,))
+
+    connection = sqlite3.connect(path)
+    assert connection.execute("SELECT address_key FROM zestimates").fetchall() == [('2 oak ave',)]
+    connection.close()
@@ -0,0 +1,29 @@
+import socket
+import subprocess
+import sys
+
+from zestimate_queue import ZestimateQueue, worker_id
+
+
+def exited_worker():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return f"{socket.gethostname()}:{process.pid}"
+
+
+def test_leases_of_an_exited_worker_are_reclaimed(tmp_path):
+    with ZestimateQueue(str(tmp_path / 'queue.sqlite')) as queue:
+        queue.enqueue([(1, '1 Main St', None), (2, '2 Main St', None)])
+        assert len(queue.lease(owner=exited_worker(), limit=2)) == 2
+
+        jobs = queue.lease(limit=2)
+        assert [job['auction_id'] for job in jobs] == [1, 2]
+        assert queue.ack([1, 2]) == 2
+
+
+def test_leases_of_a_live_worker_are_kept(tmp_path):
+    with ZestimateQueue(str(tmp_path / 'queue.sqlite')) as queue:
+        queue.enqueue([(1, '1 Main St', None)])
+        assert len(queue.lease(owner=worker_id())) == 1
+        assert queue.lease(owner='elsewhere:1') == []
+        assert queue.lease(owner=f"other-host:{exited_worker().rpartition(':')[2]}") == []
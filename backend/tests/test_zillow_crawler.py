@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+import zillow_scraper
+from zestimate_queue import ZestimateQueue
+from zillow_scraper import ZestimateWriter, ZillowCrawler
+
+
+class FakeAuctionData:
+    """Uncrawled auction_data rows, filtered by created_at the way fetch_crawlable_data's query is."""
+
+    def __init__(self):
+        self.rows = []
+
+    def __call__(self, auction_ids=None, since=None):
+        rows = [row for row in self.rows if since is None or row['created_at'] >= since]
+        return pd.DataFrame(rows, columns=['auction_id', 'address', 'debt', 'created_at'])
+
+
+@pytest.fixture
+def auction_data(monkeypatch):
+    table = FakeAuctionData()
+    monkeypatch.setattr(zillow_scraper, 'fetch_crawlable_data', table)
+    return table
+
+
+@pytest.fixture
+def crawler(tmp_path):
+    crawler = ZillowCrawler(queue_path=str(tmp_path / 'queue.sqlite'))
+    crawler.queue = ZestimateQueue(crawler.queue_path)
+    yield crawler
+    crawler.queue.close()
+
+
+def test_rows_committed_below_the_mark_are_still_enqueued(auction_data, crawler):
+    started = datetime(2026, 3, 1, 12, 0, 0)
+    # A quick save stamped 12:05 commits first and moves the mark past a slow one stamped 12:00
+    auction_data.rows = [{'auction_id': 2, 'address': '2 Main St', 'debt': None, 'created_at': started + timedelta(minutes=5)}]
+    assert crawler.enqueue_new_rows() == 1
+
+    auction_data.rows.append({'auction_id': 1, 'address': '1 Main St', 'debt': None, 'created_at': started})
+    assert crawler.enqueue_new_rows() == 1
+    assert crawler.queue.stats()['pending'] == 2
+    # The mark never moves backwards
+    assert crawler.queue.get_meta(zillow_scraper.HIGH_WATER_MARK_KEY) == (started + timedelta(minutes=5)).isoformat()
+
+
+class FakeCursor:
+    def __init__(self):
+        self.statements = []
+        self.connection = self
+
+    def execute(self, query, params=()):
+        self.statements.append((' '.join(query.split()), list(params)))
+
+    def executemany(self, query, rows):
+        self.statements.extend((' '.join(query.split()), list(row)) for row in rows)
+
+    def ping(self, reconnect=False):
+        pass
+
+    def commit(self):
+        pass
+
+
+def test_writer_sends_one_update_per_batch():
+    written = []
+    writer = ZestimateWriter(batch_size=3, on_written=written.extend)
+    writer.cursor = FakeCursor()
+    for auction_id in (1, 2, 3):
+        writer.add({'auction_id': auction_id, 'zestimate': auction_id * 1000.0, 'v_o': None})
+
+    updates = [statement for statement in writer.cursor.statements if statement[0].startswith('UPDATE auction_data')]
+    assert len(updates) == 1
+    assert updates[0][1][-3:] == [1, 2, 3]
+    assert written == [1, 2, 3] and writer.written == 3
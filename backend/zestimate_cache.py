@@ -0,0 +1,108 @@
+import re
+import sqlite3
+import threading
+import time
+
+from setup import log
+
+ZESTIMATE_CACHE_PATH = 'zestimate_cache.sqlite'
+# Cached zestimates older than this are treated as missing and fetched again.
+ZESTIMATE_CACHE_TTL = 7 * 24 * 3600
+
+STREET_SUFFIXES = {
+    'street': 'st',
+    'avenue': 'ave',
+    'road': 'rd',
+    'drive': 'dr',
+    'lane': 'ln',
+    'boulevard': 'blvd',
+    'court': 'ct',
+    'place': 'pl',
+    'terrace': 'ter',
+    'circle': 'cir',
+    'highway': 'hwy',
+    'north': 'n',
+    'south': 's',
+    'east': 'e',
+    'west': 'w',
+}
+
+
+def normalize_address(address):
+    """Key used for the cache: lowercase, no punctuation, single spaces, short street suffixes."""
+    words = re.sub(r'[^a-z0-9# ]', ' ', address.lower()).split()
+    return ' '.join(STREET_SUFFIXES.get(word, word) for word in words)
+
+
+class ZestimateCache:
+    """On-disk (SQLite) cache of zestimate lookups keyed by normalized address."""
+
+    def __init__(self, path=ZESTIMATE_CACHE_PATH, ttl=ZESTIMATE_CACHE_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS zestimates (
+                address_key TEXT PRIMARY KEY,
+                zestimate TEXT NOT NULL,
+                fetched_at REAL NOT NULL
+            )
+        """)
+        self.connection.commit()
+
+    def get(self, address):
+        if not address:
+            return None
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT zestimate, fetched_at FROM zestimates WHERE address_key = ?",
+                (normalize_address(address),)
+            ).fetchone()
+            if row and time.time() - row[1] < self.ttl:
+                self.hits += 1
+                return row[0]
+            self.misses += 1
+            return None
+
+    def set(self, address, zestimate):
+        if not address or not zestimate:
+            return
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO zestimates (address_key, zestimate, fetched_at) VALUES (?, ?, ?)",
+                (normalize_address(address), zestimate, time.time())
+            )
+            self.connection.commit()
+
+    def purge_expired(self):
+        with self.lock:
+            deleted = self.connection.execute(
+                "DELETE FROM zestimates WHERE fetched_at < ?", (time.time() - self.ttl,)
+            ).rowcount
+            self.connection.commit()
+        return deleted
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        stats = self.stats()
+        # Once per run, so expired rows don't pile up in the file
+        purged = self.purge_expired()
+        log.info(f"Zestimate cache: {stats['hits']} hits, {stats['misses']} misses, {purged} expired entries purged")
+        self.close()
@@ -0,0 +1,222 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+from setup import log
+
+ZESTIMATE_QUEUE_PATH = 'zestimate_queue.sqlite'
+# A leased job that isn't acked within this many seconds is handed to another worker.
+# Must cover the worst case of fetch_zestimate including the proxy client's retries.
+# Leases held by a process on this host that no longer exists are reclaimed at once,
+# so a restarted crawler doesn't wait this out.
+JOB_LEASE_SECONDS = 30 * 60
+# Jobs that fail this many times are moved to the dead-letter state.
+JOB_MAX_ATTEMPTS = 3
+# A failed job becomes available again after JOB_RETRY_DELAY * attempts seconds.
+JOB_RETRY_DELAY = 60
+# How long a connection waits for another process's write transaction.
+QUEUE_BUSY_TIMEOUT_MS = 30000
+
+PENDING, LEASED, DONE, DEAD = 'pending', 'leased', 'done', 'dead'
+JOB_COLUMNS = ('auction_id', 'address', 'debt', 'attempts')
+
+
+def worker_id():
+    # Leases belong to a process, so any of its threads may ack them
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def owner_exited(owner):
+    """True if `owner` (a worker_id) was a process on this host that has since exited."""
+    host, _, pid = owner.rpartition(':')
+    # On Windows os.kill would terminate the process rather than probe it
+    if host != socket.gethostname() or os.name != 'posix':
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except (PermissionError, ValueError):
+        pass
+    return False
+
+
+class ZestimateQueue:
+    """
+    Durable (SQLite) work queue of zestimate lookups, one job per auction. Workers lease
+    jobs, then ack or fail them; leases that expire, or whose worker process on this
+    host has exited, are handed out again. Several processes can share the file: WAL mode plus BEGIN
+    IMMEDIATE make each lease an atomic claim.
+    """
+
+    def __init__(self, path=ZESTIMATE_QUEUE_PATH, lease_seconds=JOB_LEASE_SECONDS, max_attempts=JOB_MAX_ATTEMPTS):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute(f"PRAGMA busy_timeout = {QUEUE_BUSY_TIMEOUT_MS}")
+        self.connection.execute("PRAGMA journal_mode = WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                auction_id INTEGER PRIMARY KEY,
+                address TEXT NOT NULL,
+                debt REAL,
+                state TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                lease_owner TEXT,
+                lease_expires REAL,
+                last_error TEXT,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, available_at)")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS queue_meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def _transaction(self, statements):
+        with self.lock:
+            self.connection.execute("BEGIN IMMEDIATE")
+            try:
+                result = statements(self.connection)
+                self.connection.execute("COMMIT")
+                return result
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, rows):
+        """Adds jobs for (auction_id, address, debt) rows. Auctions already queued, in any state, are skipped."""
+        now = time.time()
+        params = [(auction_id, address, debt, PENDING, now, now) for auction_id, address, debt in rows if address]
+        if not params:
+            return 0
+
+        def insert(connection):
+            before = connection.total_changes
+            connection.executemany(
+                "INSERT OR IGNORE INTO jobs (auction_id, address, debt, state, available_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                params
+            )
+            return connection.total_changes - before
+
+        return self._transaction(insert)
+
+    def lease(self, owner=None, limit=1):
+        """Claims up to `limit` ready jobs (pending, or leased with an expired lease) as dicts."""
+        owner = owner or worker_id()
+
+        def claim(connection):
+            now = time.time()
+            # Leases of a killed worker on this host expire now rather than after lease_seconds
+            owners = connection.execute(
+                "SELECT DISTINCT lease_owner FROM jobs WHERE state = ? AND lease_expires >= ?", (LEASED, now)
+            ).fetchall()
+            connection.executemany(
+                "UPDATE jobs SET lease_expires = 0 WHERE state = ? AND lease_owner = ?",
+                [(LEASED, lease_owner) for (lease_owner,) in owners if owner_exited(lease_owner)]
+            )
+            # Jobs whose last lease ran out after their final attempt go to dead-letter
+            connection.execute(
+                "UPDATE jobs SET state = ?, last_error = 'lease expired', lease_owner = NULL, updated_at = ? "
+                "WHERE state = ? AND lease_expires < ? AND attempts >= ?",
+                (DEAD, now, LEASED, now, self.max_attempts)
+            )
+            rows = connection.execute(
+                f"SELECT {', '.join(JOB_COLUMNS)} FROM jobs "
+                "WHERE (state = ? AND available_at <= ?) OR (state = ? AND lease_expires < ?) "
+                "ORDER BY available_at LIMIT ?",
+                (PENDING, now, LEASED, now, limit)
+            ).fetchall()
+            connection.executemany(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, lease_owner = ?, lease_expires = ?, updated_at = ? "
+                "WHERE auction_id = ?",
+                [(LEASED, owner, now + self.lease_seconds, now, row[0]) for row in rows]
+            )
+            return [dict(zip(JOB_COLUMNS, row), attempts=row[3] + 1) for row in rows]
+
+        return self._transaction(claim)
+
+    def _finish(self, auction_ids, owner, assignments, params):
+        # Only the current lease holder may finish a job, so a worker whose lease
+        # expired can't overwrite the outcome of the worker that took over.
+        now, owner = time.time(), owner or worker_id()
+
+        def update(connection):
+            before = connection.total_changes
+            connection.executemany(
+                f"UPDATE jobs SET {assignments}, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE auction_id = ? AND state = ? AND lease_owner = ?",
+                [(*params, now, auction_id, LEASED, owner) for auction_id in auction_ids]
+            )
+            return connection.total_changes - before
+
+        return self._transaction(update)
+
+    def ack(self, auction_ids, owner=None):
+        return self._finish(auction_ids, owner, "state = ?, last_error = NULL", (DONE,))
+
+    def fail(self, auction_id, attempts, error, owner=None):
+        """Puts the job back with a delay, or dead-letters it after max_attempts."""
+        if attempts >= self.max_attempts:
+            log.warning(f"Dead-lettering zestimate job {auction_id} after {attempts} attempts: {error}")
+            return self._finish([auction_id], owner, "state = ?, last_error = ?", (DEAD, str(error)))
+        return self._finish(
+            [auction_id], owner, "state = ?, available_at = ?, last_error = ?",
+            (PENDING, time.time() + JOB_RETRY_DELAY * attempts, str(error))
+        )
+
+    def release(self, auction_id, owner=None):
+        """Returns a leased job untouched, without counting the attempt."""
+        return self._finish([auction_id], owner, "state = ?, attempts = attempts - 1", (PENDING,))
+
+    def requeue_dead(self):
+        """Puts dead-lettered jobs back as pending with their attempts reset (zillow_scraper.py --requeue-dead)."""
+        def update(connection):
+            return connection.execute(
+                "UPDATE jobs SET state = ?, attempts = 0, available_at = ?, updated_at = ? WHERE state = ?",
+                (PENDING, time.time(), time.time(), DEAD)
+            ).rowcount
+
+        return self._transaction(update)
+
+    def next_available_in(self):
+        """Seconds until the next pending or leased job can be claimed, or None if there are none."""
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT MIN(CASE WHEN state = ? THEN available_at ELSE lease_expires END) FROM jobs WHERE state IN (?, ?)",
+                (PENDING, PENDING, LEASED)
+            ).fetchone()
+        return None if row[0] is None else max(row[0] - time.time(), 0.0)
+
+    def get_meta(self, key):
+        with self.lock:
+            row = self.connection.execute("SELECT value FROM queue_meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key, value):
+        self._transaction(lambda connection: connection.execute(
+            "INSERT OR REPLACE INTO queue_meta (key, value) VALUES (?, ?)", (key, value)
+        ))
+
+    def stats(self):
+        with self.lock:
+            counts = dict(self.connection.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+        return {state: counts.get(state, 0) for state in (PENDING, LEASED, DONE, DEAD)}
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        stats = self.stats()
+        log.info(
+            f"Zestimate queue: {stats[PENDING]} pending, {stats[LEASED]} leased, "
+            f"{stats[DONE]} done, {stats[DEAD]} dead"
+        )
+        self.close()
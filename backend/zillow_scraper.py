@@ -1,7 +1,11 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 from decimal import Decimal
+from html import unescape
 import os
 import re
+import threading
 import time
 from typing import List
 from bs4 import BeautifulSoup
@@ -9,7 +13,32 @@ from selenium import webdriver
 from selenium.webdriver.common.by import By
 import pandas as pd
 
-from setup import MySQLConnection, clean_monetary_string, proxied_request, log, retry
+from metrics import metrics, stage_timer
+from setup import BudgetExceeded, CircuitOpen, MySQLConnection, bump_data_version, clean_monetary_string, ensure_data_version_table, proxied_request, log
+from zestimate_cache import ZESTIMATE_CACHE_PATH, ZestimateCache
+from zestimate_queue import JOB_RETRY_DELAY, JOB_MAX_ATTEMPTS, ZESTIMATE_QUEUE_PATH, ZestimateQueue
+
+# Number of addresses looked up concurrently. Per-host throttling is handled by
+# the proxy client's rate limiter inside proxied_request.
+ZILLOW_MAX_WORKERS = 8
+
+# Zestimate results are written back once this many are buffered, or every
+# WRITEBACK_FLUSH_SECONDS, whichever comes first.
+WRITEBACK_BATCH_SIZE = 50
+WRITEBACK_FLUSH_SECONDS = 30
+
+# On the first run (no high-water mark in the queue yet) rows created this long ago are enqueued.
+INITIAL_CRAWL_WINDOW = timedelta(hours=10)
+HIGH_WATER_MARK_KEY = 'created_at_high_water_mark'
+# Each enqueue re-reads rows created this long before the mark: saves stamp created_at
+# when they start, so a slow or parallel save (or another crawler process) can commit
+# rows below a mark that has already moved past them. INSERT OR IGNORE drops the repeats.
+ENQUEUE_OVERLAP = timedelta(days=1)
+# drain() waits this long at most for retry delays or other workers' leases to run out.
+DRAIN_MAX_WAIT = JOB_RETRY_DELAY * JOB_MAX_ATTEMPTS
+
+zestimate_seconds = metrics.timer('zestimate_fetch_seconds', 'Zestimate page fetch and extraction, by outcome')
+zestimate_cache_lookups = metrics.counter('zestimate_cache_lookups_total', 'Zestimate cache lookups, by result')
 
 def save_html(content, file_name):
     file_path = os.path.join('html_pages', file_name)
@@ -19,18 +48,25 @@ def save_html(content, file_name):
     except Exception as e:
         pass
 
-def fetch_crawlable_data():
+def fetch_crawlable_data(auction_ids=None, since=None):
     log.info("Fetching crawlable data from the database.")
     with MySQLConnection() as cursor:
-        time_24_hours_ago = datetime.now() - timedelta(hours=10)
+        if since is None:
+            since = datetime.now() - INITIAL_CRAWL_WINDOW
         select_query = """
             SELECT * FROM auction_data
             WHERE (zestimate IS NULL OR zestimate = '')
-            AND created_at >= %s;
+            AND created_at >= %s
         """
+        params = [since]
+        if auction_ids is not None:
+            if not len(auction_ids):
+                return pd.DataFrame()
+            select_query += f" AND auction_id IN ({', '.join(['%s'] * len(auction_ids))})"
+            params.extend(auction_ids)
         
         try:
-            cursor.execute(select_query, (time_24_hours_ago,))
+            cursor.execute(select_query, params)
             results = cursor.fetchall()
             column_names = [desc[0] for desc in cursor.description]
             df = pd.DataFrame(results, columns=column_names)
@@ -44,22 +80,54 @@ def fetch_crawlable_data():
             log.error(f"Error fetching data: {e}")
             return pd.DataFrame()
 
-@retry(max_retry_count=2, interval_sec=5)
-def get_zestimate(address: str):
-    status, i = 500, 0
-    while status != 200:
-        i += 1
-        url = f'https://www.zillow.com/homes/{address.replace(" ", "-").replace("/", "-")}_rb'
-        log.info(f'Scraping Zestimate for address : {address}  Requesting URL: {url}')
-        
+def zillow_url(address):
+    return f'https://www.zillow.com/homes/{address.replace(" ", "-").replace("/", "-")}_rb'
+
+
+def fetch_zestimate(address: str):
+    url = zillow_url(address)
+    log.info(f'Scraping Zestimate for address : {address}  Requesting URL: {url}')
+
+    started = time.monotonic()
+    outcome = 'error'
+    try:
+        # proxied_request already retries transient failures with backoff
         response = proxied_request(url)
         if response.status_code != 200:
-            log.error(f'{i} times. || Failed to retrieve the page. Status code: {response.status_code}. Retrying in 30 seconds.')
-            time.sleep(30)
-        else:
-            status = 200
+            raise Exception(f'Failed to retrieve the page. Status code: {response.status_code}')
+        zestimate = extract_zestimate(response.text, address)
+        outcome = 'found' if zestimate else 'none'
+        return zestimate
+    finally:
+        zestimate_seconds.observe(time.monotonic() - started, outcome=outcome)
+
+
+PRICE_SPAN_PATTERN = re.compile(r'<span[^>]*\bdata-testid=["\']price["\'][^>]*>(.*?)</span>', re.S)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+# "zestimate":123456 in the embedded page data, which may itself be a JSON-escaped string
+ZESTIMATE_JSON_PATTERN = re.compile(r'\\?"zestimate\\?"\s*:\s*(\d+(?:\.\d+)?)')
+
+
+def extract_zestimate_fast(html):
+    """
+    Cheap extraction without building a soup: the price span, then the zestimate in
+    the embedded JSON payload (only if the page has a single distinct value, since
+    search result pages list several homes). Returns None when neither is usable.
+    """
+    match = PRICE_SPAN_PATTERN.search(html)
+    if match:
+        price_text = unescape(TAG_PATTERN.sub('', match.group(1)))
+        if clean_monetary_string(price_text):
+            return price_text
 
-    soup = BeautifulSoup(response.text, 'html.parser')
+    values = set(ZESTIMATE_JSON_PATTERN.findall(html))
+    if len(values) == 1:
+        return f"${round(float(values.pop())):,}"
+    return None
+
+
+def extract_zestimate_soup(html, address):
+    soup = BeautifulSoup(html, 'html.parser')
     price_element = soup.find('span', {'data-testid': 'price'})
     if price_element:
         log.info(f"Found direct zestimate: {price_element.text}")
@@ -79,7 +147,7 @@ def get_zestimate(address: str):
         for i in range(3):
             parent = parent.find_parent()
             parent_text = parent.__str__()
-            log.info(parent_text)
+            log.debug(parent_text)
             if 'rent' in parent_text.lower():
                 return None
             match = re.search(r'\$\d[\d,]*', parent_text)
@@ -92,30 +160,236 @@ def get_zestimate(address: str):
     raise Exception()
 
 
-def update_database(row):
-    try:
-        with MySQLConnection() as cursor:
-            update_query = """
-            UPDATE auction_data
-            SET 
-                zestimate = IF(zestimate IS NULL, %s, zestimate), 
-                v_o = IF(v_o IS NULL, %s, v_o)
-            WHERE auction_id = %s;
-            """
-            cursor.execute(update_query, (row["zestimate"], row["v_o"], row["auction_id"]))
-    except Exception as e:
-        log.error(f"Error updating database: {e}")
-
-
-def zillow_crawler():
-    df = fetch_crawlable_data()
-    for _, row in df.iterrows():
-        zestimate = get_zestimate(row['address'])
-        zestimate = clean_monetary_string(zestimate)
-        if row["debt"] and zestimate:
-            v_o = zestimate/row["debt"]
-        else:
-            v_o = None
-        row["zestimate"] = zestimate
-        row["v_o"] = v_o
-        update_database(row)
\ No newline at end of file
+def extract_zestimate(html, address):
+    zestimate = extract_zestimate_fast(html)
+    if zestimate:
+        log.info(f'Found Zestimate: {zestimate} for address : {address}')
+        return zestimate
+    return extract_zestimate_soup(html, address)
+
+
+def update_zestimates_query(batch):
+    """
+    One UPDATE for a batch of (zestimate, v_o, auction_id) rows. pymysql's executemany
+    only folds INSERT/REPLACE ... VALUES into one statement, so an UPDATE would still
+    be one round trip per row. Values already set in the table are kept.
+    """
+    cases = ' '.join(['WHEN %s THEN %s'] * len(batch))
+    query = f"""
+        UPDATE auction_data
+        SET
+            zestimate = IF(zestimate IS NULL, CASE auction_id {cases} END, zestimate),
+            v_o = IF(v_o IS NULL, CASE auction_id {cases} END, v_o)
+        WHERE auction_id IN ({', '.join(['%s'] * len(batch))})
+    """
+    params = [value for zestimate, _, auction_id in batch for value in (auction_id, zestimate)]
+    params += [value for _, v_o, auction_id in batch for value in (auction_id, v_o)]
+    params += [auction_id for _, _, auction_id in batch]
+    return query, params
+
+
+class ZestimateWriter:
+    """
+    Buffers crawled rows and writes them back in batches over a single connection,
+    one UPDATE and one commit per batch. A crash loses at most the rows still buffered.
+    on_written, if given, is called with the auction IDs of each committed batch.
+    """
+
+    def __init__(self, batch_size=WRITEBACK_BATCH_SIZE, flush_interval=WRITEBACK_FLUSH_SECONDS, on_written=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_written = on_written
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.buffer = []
+        self.written = 0
+
+    def __enter__(self):
+        self.db = MySQLConnection()
+        self.cursor = self.db.__enter__()
+        self.flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+        self.flusher.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stopped.set()
+        self.flusher.join()
+        self.flush()
+        self.db.__exit__(exc_type, exc_val, exc_tb)
+        log.info(f"Wrote back {self.written} zestimates")
+
+    def add(self, row):
+        with self.lock:
+            self.buffer.append((row["zestimate"], row["v_o"], row["auction_id"]))
+            if len(self.buffer) >= self.batch_size:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def _flush_periodically(self):
+        while not self.stopped.wait(self.flush_interval):
+            self.flush()
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        batch, self.buffer = self.buffer, []
+        connection = self.cursor.connection
+        try:
+            connection.ping(reconnect=True)
+            with stage_timer.time(stage='zestimate_writeback'):
+                self.cursor.execute(*update_zestimates_query(batch))
+                bump_data_version(self.cursor)
+                connection.commit()
+            self.written += len(batch)
+        except Exception as e:
+            connection.rollback()
+            log.error(f"Error updating database for {len(batch)} rows: {e}")
+            return
+        if self.on_written:
+            self.on_written([auction_id for _, _, auction_id in batch])
+
+
+def crawl_row(row, writer, cache):
+    zestimate = cache.get(row['address'])
+    zestimate_cache_lookups.inc(result='miss' if zestimate is None else 'hit')
+    if zestimate is None:
+        zestimate = fetch_zestimate(row['address'])
+        cache.set(row['address'], zestimate)
+    zestimate = clean_monetary_string(zestimate)
+    if row["debt"] and zestimate:
+        v_o = zestimate/row["debt"]
+    else:
+        v_o = None
+    row["zestimate"] = zestimate
+    row["v_o"] = v_o
+    writer.add(row)
+    return row
+
+
+def job_rows(df):
+    for auction_id, address, debt in df[['auction_id', 'address', 'debt']].itertuples(index=False):
+        yield int(auction_id), address, None if pd.isna(debt) else float(debt)
+
+
+class ZillowCrawler:
+    """
+    Worker pool, writeback buffer and cache for zestimate lookups, fed from the durable
+    ZestimateQueue. Rows can be submitted in several batches (e.g. one per county as it
+    is saved); a job is only acked once its zestimate is committed to MySQL, so a killed
+    run resumes with whatever was left. Several processes may drain the same queue.
+    """
+
+    def __init__(self, max_workers=ZILLOW_MAX_WORKERS, queue_path=ZESTIMATE_QUEUE_PATH, cache_path=ZESTIMATE_CACHE_PATH):
+        self.max_workers = max_workers
+        self.queue_path = queue_path
+        self.cache_path = cache_path
+        self.stopped = threading.Event()
+
+    def __enter__(self):
+        self.queue = ZestimateQueue(self.queue_path).__enter__()
+        self.cache = ZestimateCache(self.cache_path).__enter__()
+        self.writer = ZestimateWriter(on_written=self.queue.ack).__enter__()
+        self.executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stopped.set()
+        self.executor.shutdown(wait=True)
+        self.writer.__exit__(exc_type, exc_val, exc_tb)
+        self.cache.__exit__(exc_type, exc_val, exc_tb)
+        self.queue.__exit__(exc_type, exc_val, exc_tb)
+
+    def enqueue_new_rows(self):
+        """Enqueues uncrawled rows created since the queue's high-water mark (less ENQUEUE_OVERLAP) and advances it."""
+        mark = self.queue.get_meta(HIGH_WATER_MARK_KEY)
+        mark = datetime.fromisoformat(mark) if mark else None
+        df = fetch_crawlable_data(since=mark - ENQUEUE_OVERLAP if mark else None)
+        if df.empty:
+            return 0
+        added = self.queue.enqueue(job_rows(df))
+        latest = pd.Timestamp(df['created_at'].max()).to_pydatetime()
+        self.queue.set_meta(HIGH_WATER_MARK_KEY, max(latest, mark).isoformat() if mark else latest.isoformat())
+        log.info(f"Enqueued {added} new zestimate jobs")
+        return added
+
+    def process_next(self):
+        """Leases one ready job and crawls it. Returns the job, or None if none was ready."""
+        if self.stopped.is_set():
+            return None
+        jobs = self.queue.lease()
+        if not jobs:
+            return None
+        job = jobs[0]
+        try:
+            crawl_row(job, self.writer, self.cache)
+        except BudgetExceeded as e:
+            self.queue.release(job['auction_id'])
+            if not self.stopped.is_set():
+                log.error(f"Stopping zestimate crawl: {e}")
+            self.stopped.set()
+        except CircuitOpen as e:
+            self.queue.release(job['auction_id'])
+            log.warning(f"{e}; pausing worker for {JOB_RETRY_DELAY}s")
+            self.stopped.wait(JOB_RETRY_DELAY)
+        except Exception as e:
+            log.error(f"Error crawling zestimate for {job['address']} (attempt {job['attempts']}): {e}")
+            self.queue.fail(job['auction_id'], job['attempts'], e)
+        return job
+
+    def submit(self, df):
+        if df.empty:
+            return {}
+        self.queue.enqueue(job_rows(df))
+        # Each task claims whichever job is ready next, not necessarily this row's
+        return {self.executor.submit(self.process_next): row.address for row in df.itertuples()}
+
+    def wait(self, futures):
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                future.result()
+            except Exception as e:
+                log.error(f"Error crawling zestimate for {futures[future]}: {e}")
+            if done % 50 == 0:
+                log.info(f"Crawled {done}/{len(futures)} zestimates")
+
+    def _drain_worker(self):
+        while self.process_next() is not None:
+            pass
+
+    def drain(self):
+        """Works the queue until it is empty, waiting up to DRAIN_MAX_WAIT for retries to come due."""
+        while not self.stopped.is_set():
+            for future in [self.executor.submit(self._drain_worker) for _ in range(self.max_workers)]:
+                future.result()
+            self.writer.flush()
+            wait = self.queue.next_available_in()
+            if wait is None or wait > DRAIN_MAX_WAIT:
+                break
+            self.stopped.wait(wait)
+        log.info(f"Zestimate queue after drain: {self.queue.stats()}")
+
+    def crawl(self, df):
+        log.info(f"Crawling zestimates for {len(df)} entries with {self.max_workers} workers")
+        self.wait(self.submit(df))
+        self.drain()
+
+
+def zillow_crawler(max_workers=ZILLOW_MAX_WORKERS, requeue_dead=False):
+    ensure_data_version_table()
+    with ZillowCrawler(max_workers) as crawler:
+        if requeue_dead:
+            log.info(f"Requeued {crawler.queue.requeue_dead()} dead-lettered zestimate jobs")
+        crawler.enqueue_new_rows()
+        crawler.drain()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawls zestimates for auctions that don't have one yet.")
+    parser.add_argument('--workers', type=int, default=ZILLOW_MAX_WORKERS)
+    parser.add_argument('--requeue-dead', action='store_true',
+                        help="give dead-lettered jobs another JOB_MAX_ATTEMPTS attempts before crawling")
+    args = parser.parse_args()
+    zillow_crawler(args.workers, requeue_dead=args.requeue_dead)
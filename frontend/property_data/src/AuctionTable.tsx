@@ -28,17 +28,27 @@ interface Data {
   v_o: string;
 }
 
+interface AuctionPage {
+  rows: Data[];
+  total_count: number;
+  next_cursor: string | null;
+}
+
 const fetchData = async (
   page: number,
   pageSize: number,
   sortField: string,
   sortOrder: string,
-  search: string | null
-) => {
-  let url = `https://aucqljn2n8.execute-api.us-east-1.amazonaws.com/auctions?page=${page}&pageSize=${pageSize}&sortField=${sortField}&sortOrder=${sortOrder}`;
+  search: string | null,
+  cursor: string | null
+): Promise<AuctionPage> => {
+  let url = `https://aucqljn2n8.execute-api.us-east-1.amazonaws.com/auctions/page?page=${page}&pageSize=${pageSize}&sortField=${sortField}&sortOrder=${sortOrder}`;
   if (search) {
     url += `&search=${encodeURIComponent(search)}`;
   }
+  if (cursor) {
+    url += `&cursor=${encodeURIComponent(cursor)}`;
+  }
   const response = await fetch(url, {
     headers: { accept: 'application/json' },
   });
@@ -137,24 +147,23 @@ export default function EnhancedTable() {
   const [count, setCount] = React.useState(15);
   const [search, setSearch] = React.useState<string | null>(null);
 
-  const fetchCount = async () => {
-    try {
-      const response = await fetch(`https://aucqljn2n8.execute-api.us-east-1.amazonaws.com/auctions/count?search=${encodeURIComponent(search ?? '')}`);
-      const data = await response.json();
-      setCount(data.total_count);
-    } catch (error) {
-      console.error('Error fetching count:', error);
-    }
-  };
+  // Keyset cursors for pages we have already reached, so paging forward avoids deep OFFSETs
+  const pageCursors = React.useRef<Record<number, string>>({});
 
   React.useEffect(() => {
-    fetchCount();
-  }, [search]);
+    pageCursors.current = {};
+  }, [rowsPerPage, order, orderBy, search]);
 
   const fetchRows = async () => {
     try {
-      const data = await fetchData(page + 1, rowsPerPage, orderBy, order, search);
-      setRows(data);
+      const data = await fetchData(
+        page + 1, rowsPerPage, orderBy, order, search, pageCursors.current[page] ?? null
+      );
+      setRows(data.rows);
+      setCount(data.total_count);
+      if (data.next_cursor) {
+        pageCursors.current[page + 1] = data.next_cursor;
+      }
     } catch (error) {
       console.error('Error fetching data:', error);
     }